@@ -0,0 +1,53 @@
+"""Utilidades compartidas por los scripts de benchmarks/."""
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, 'src')
+
+
+def scratch_database_url(name):
+    return 'sqlite:///' + os.path.join(tempfile.mkdtemp(), name)
+
+
+def best_of(repeat, fn):
+    """Menor tiempo de `repeat` llamadas a `fn`, en segundos."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def load_app(database_url, **env):
+    """Crea la app de src/app.py apuntando a `database_url`. create_app() lee la configuración
+    del entorno, por eso las variables se fijan antes. Devuelve la app, db, los modelos y
+    reconcile_like_counts en un solo objeto."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('CACHE_BACKEND', 'none')
+    for key, value in env.items():
+        os.environ[key] = value
+    if SRC not in sys.path:
+        sys.path.insert(0, SRC)
+    import app as factory
+    import favorites
+    import models
+    api = SimpleNamespace(app=factory.create_app(), reconcile_like_counts=favorites.reconcile_like_counts)
+    for name in ('db', 'User', 'People', 'Planets', 'Vehicle', 'Likes', 'LikeCount'):
+        setattr(api, name, getattr(models, name))
+    return api
+
+
+def reset_schema(api):
+    """Borra todo y recrea el esquema con las migraciones (así se prueban sus índices)."""
+    from flask_migrate import upgrade
+
+    with api.app.app_context():
+        api.db.drop_all()
+        with api.db.engine.begin() as conn:
+            conn.exec_driver_sql("DROP TABLE IF EXISTS alembic_version")
+        upgrade(directory=os.path.join(ROOT, 'migrations'))
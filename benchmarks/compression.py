@@ -0,0 +1,54 @@
+"""
+Micro-benchmark de compresión de /people y /planets: bytes por codificación, CPU de comprimir
+al vuelo (nivel rápido) y de precomprimir para el cache (nivel alto), y latencia de un hit del
+cache con la variante ya guardada contra el cuerpo sin comprimir.
+
+    $ python benchmarks/compression.py [cantidad_de_filas] [repeticiones]
+
+brotli y zstd se miden solo si están instalados los paquetes `brotli` y `zstandard`.
+"""
+import sys
+from common import best_of, load_app, reset_schema, scratch_database_url
+
+
+def setup(rows):
+    api = load_app(scratch_database_url('compression.db'), CACHE_BACKEND='memory')
+    reset_schema(api)
+    with api.app.app_context():
+        api.db.session.execute(api.People.__table__.insert(), [
+            {'name': 'Person %d' % i, 'birth_year': 1900 + i % 100, 'homeworld': 'Planet %d' % (i % 500), 'starship': 'X-Wing'}
+            for i in range(rows)
+        ])
+        api.db.session.execute(api.Planets.__table__.insert(), [
+            {'name': 'Planet %d' % i, 'population': i * 1000, 'gravity': '1 standard', 'climate': i % 10}
+            for i in range(rows)
+        ])
+        api.db.session.commit()
+    return api
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    api = setup(rows)
+    from compression import PREFERENCE, compress
+
+    client = api.app.test_client()
+    print("%-9s %-9s %12s %7s %12s %12s %12s" % (
+        'url', 'encoding', 'bytes', 'ratio', 'al vuelo ms', 'cache ms', 'hit ms'))
+    for url in ('/people', '/planets'):
+        body = client.get(url, headers={'Accept-Encoding': 'identity'}).get_data()
+        hit = best_of(repeat, lambda: client.get(url, headers={'Accept-Encoding': 'identity'}).get_data())
+        print("%-9s %-9s %12d %7s %12s %12s %12.2f" % (url, 'identity', len(body), '1.0', '-', '-', hit * 1000))
+        for encoding in PREFERENCE:
+            headers = {'Accept-Encoding': encoding}
+            fast = best_of(repeat, lambda: compress(body, encoding))
+            slow = best_of(repeat, lambda: compress(body, encoding, cached=True))
+            size = len(client.get(url, headers=headers).get_data())  # guarda la variante en el cache
+            hit = best_of(repeat, lambda: client.get(url, headers=headers).get_data())
+            print("%-9s %-9s %12d %7.1f %12.2f %12.2f %12.2f" % (
+                url, encoding, size, len(body) / size, fast * 1000, slow * 1000, hit * 1000))
+
+
+if __name__ == '__main__':
+    main()
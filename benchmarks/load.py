@@ -0,0 +1,372 @@
+"""
+Benchmark de carga reproducible de la API.
+
+Siembra una base descartable (SQLite por defecto, o la URL de --database-url) con los
+tamaños indicados, recorre todas las rutas de src/app.py y reporta por endpoint latencia
+p50/p99, throughput, sentencias SQL por request y memoria. El resultado se guarda en JSON
+para poder comparar commits:
+
+    $ python benchmarks/load.py --people 100000 --planets 100000 --likes 1000000 -o base.json
+    $ python benchmarks/load.py --gunicorn --workers 4 --concurrency 32 -o gunicorn.json
+    $ python benchmarks/load.py --asgi --workers 4 --concurrency 256 -o asgi.json
+    $ python benchmarks/load.py --compare gunicorn.json asgi.json
+
+--gunicorn mide el despliegue WSGI de siempre (src/wsgi.py) y --asgi el de src/asgi.py con
+uvicorn, con los mismos workers y clientes concurrentes.
+
+Las sentencias por request salen del header Server-Timing (INSTRUMENTATION=1); las respuestas
+en streaming no las informan ahí (quedan en /metrics) y se reportan sin valor.
+La memoria es el pico de RSS del proceso (o de los workers), que solo crece: se informa el
+acumulado hasta cada endpoint y cuánto lo subió ese endpoint.
+¡Borra todas las tablas de la base indicada!
+"""
+import argparse
+import json
+import os
+import random
+import re
+import resource
+import socket
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from common import ROOT, SRC, load_app, reset_schema, scratch_database_url
+
+BATCH_SIZE = 10000
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def seed(api, sizes):
+    """Carga los tamaños pedidos con executemany por lotes."""
+    def batched(table, rows):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                api.db.session.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            api.db.session.execute(table.insert(), batch)
+
+    with api.app.app_context():
+        batched(api.User.__table__, ({'email': 'user%d@example.com' % i, 'password': 'secret%d' % i}
+                                     for i in range(sizes['users'])))
+        batched(api.People.__table__, ({'name': 'Person %d' % i, 'birth_year': 1900 + i % 120,
+                                        'homeworld': 'Planet %d' % (i % max(sizes['planets'], 1)), 'starship': 'X-Wing'}
+                                       for i in range(sizes['people'])))
+        batched(api.Planets.__table__, ({'name': 'Planet %d' % i, 'population': i * 1000, 'gravity': '1 standard',
+                                         'climate': i % 10} for i in range(sizes['planets'])))
+        batched(api.Vehicle.__table__, ({'name': 'Vehicle %d' % i, 'model': 'T-%d' % i,
+                                         'vehicle_class': ('speeder', 'walker', 'starfighter')[i % 3], 'passengers': i % 50}
+                                        for i in range(sizes['vehicles'])))
+        # Likes únicos por (usuario, entidad): se reparten en orden entre usuarios y personajes/planetas
+        users, people, planets = sizes['users'], sizes['people'], sizes['planets']
+        capacity = users * (people + planets)
+        if sizes['likes'] > capacity:
+            raise SystemExit("No entran %d likes únicos con esos tamaños (máximo %d)" % (sizes['likes'], capacity))
+
+        def likes():
+            for i in range(sizes['likes']):
+                user, slot = i % users + 1, i // users
+                if slot < people:
+                    yield {'user_id': user, 'people_id': slot + 1}
+                else:
+                    yield {'user_id': user, 'planets_id': slot - people + 1}
+        batched(api.Likes.__table__, likes())
+        api.db.session.commit()
+        # Los likes se cargan sin pasar por favorites.py: los contadores se calculan al final
+        api.reconcile_like_counts()
+
+
+def routes(sizes):
+    """(nombre, método, url, cuerpo) para cada ruta; las funciones reciben el número de iteración."""
+    rnd = random.Random(42)
+
+    def person():
+        return rnd.randint(1, sizes['people'])
+
+    def planet():
+        return rnd.randint(1, sizes['planets'])
+
+    def user():
+        return rnd.randint(1, sizes['users'])
+
+    return [
+        ('people_list', 'GET', lambda i: '/people', None),
+        ('people_page', 'GET', lambda i: '/people?limit=50', None),
+        ('people_fields', 'GET', lambda i: '/people?fields=id,name&limit=200', None),
+        ('people_stream', 'GET', lambda i: '/people?stream=1', None),
+        ('people_detail', 'GET', lambda i: '/people/%d' % person(), None),
+        ('people_search', 'GET', lambda i: '/people?name_prefix=Person%%20%d' % rnd.randint(1, 99), None),
+        ('people_popular', 'GET', lambda i: '/people/popular', None),
+        ('planets_list', 'GET', lambda i: '/planets', None),
+        ('planets_page', 'GET', lambda i: '/planets?limit=50', None),
+        ('planets_detail', 'GET', lambda i: '/planets/%d' % planet(), None),
+        ('planets_popular', 'GET', lambda i: '/planets/popular?limit=50', None),
+        ('planets_population', 'GET', lambda i: '/planets?population_min=1000&population_max=50000', None),
+        ('vehicles_list', 'GET', lambda i: '/vehicles?limit=50', None),
+        ('vehicles_filter', 'GET', lambda i: '/vehicles?vehicle_class=walker&passengers_min=10&limit=50', None),
+        ('vehicles_detail', 'GET', lambda i: '/vehicles/%d' % rnd.randint(1, sizes['vehicles']), None),
+        ('user_list', 'GET', lambda i: '/user?limit=50', None),
+        ('user_likes', 'GET', lambda i: '/user/%d/likes' % user(), None),
+        ('user_likes_expand', 'GET', lambda i: '/user/%d/likes?expand=people,planets' % user(), None),
+        # Los vehículos no se siembran como favoritos: agregar y borrar siempre encuentra el mismo estado
+        ('like_add', 'POST', lambda i: '/likes/vehicles/%d/%d' % (i % sizes['users'] + 1, i // sizes['users'] % sizes['vehicles'] + 1), None),
+        ('like_remove', 'DELETE', lambda i: '/likes/vehicles/%d/%d' % (i % sizes['users'] + 1, i // sizes['users'] % sizes['vehicles'] + 1), None),
+        ('likes_batch_add', 'POST', lambda i: '/user/%d/likes:batch' % user(),
+         lambda i: [{'type': 'vehicles', 'id': rnd.randint(1, sizes['vehicles'])} for _ in range(10)]),
+        ('likes_batch_remove', 'DELETE', lambda i: '/user/%d/likes:batch' % user(),
+         lambda i: [{'type': 'vehicles', 'id': rnd.randint(1, sizes['vehicles'])} for _ in range(10)]),
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies, queries, elapsed, errors):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+    }
+
+
+def queries_from(headers):
+    match = QUERIES.search(headers.get('Server-Timing', ''))
+    return int(match.group(1)) if match else None
+
+
+def run_test_client(api, sizes, requests):
+    client = api.app.test_client()
+    results = {}
+    peak = rss_peak_kb()
+    for name, method, url, body in routes(sizes):
+        latencies, queries, errors = [], [], 0
+        start = time.perf_counter()
+        for i in range(requests):
+            payload = body(i) if body else None
+            began = time.perf_counter()
+            response = client.open(url(i), method=method, json=payload)
+            response.get_data()
+            latencies.append(time.perf_counter() - began)
+            errors += response.status_code >= 500
+            count = queries_from(response.headers)
+            if count is not None:
+                queries.append(count)
+        results[name] = summarize(latencies, queries, time.perf_counter() - start, errors)
+        peak = add_memory(results[name], peak, rss_peak_kb())
+        print_row(name, results[name])
+    return results
+
+
+def rss_peak_kb():
+    # ru_maxrss es el pico del proceso hasta ahora (KB en Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def add_memory(row, before, after):
+    """El pico de RSS solo crece: se guarda el acumulado hasta este endpoint y cuánto lo
+    subió este endpoint (0 si no pidió más memoria que los anteriores)."""
+    row['cumulative_peak_rss_kb'] = after
+    row['peak_rss_growth_kb'] = after - before if after is not None and before is not None else None
+    return after
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def process_tree_hwm_kb(pid):
+    """Suma de VmHWM (RSS pico) del proceso del servidor y sus workers, leyendo /proc."""
+    pids = [pid]
+    try:
+        with open('/proc/%d/task/%d/children' % (pid, pid)) as children:
+            pids += [int(child) for child in children.read().split()]
+    except OSError:
+        return None
+    total = 0
+    for child in pids:
+        try:
+            with open('/proc/%d/status' % child) as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total
+
+
+def server_command(kind, port, workers):
+    if kind == 'asgi':
+        return ['uvicorn', 'asgi:application', '--app-dir', SRC, '--workers', str(workers),
+                '--host', '127.0.0.1', '--port', str(port), '--no-access-log']
+    return ['gunicorn', 'wsgi', '--chdir', SRC, '--workers', str(workers), '--bind', '127.0.0.1:%d' % port]
+
+
+def run_server(kind, database_url, sizes, requests, workers, concurrency, env):
+    port = free_port()
+    server = subprocess.Popen(
+        server_command(kind, port, workers),
+        env=dict(os.environ, DATABASE_URL=database_url, INSTRUMENTATION='1', **env),
+    )
+    base = 'http://127.0.0.1:%d' % port
+    try:
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(base + '/user?limit=1').read()
+                break
+            except OSError:
+                time.sleep(0.1)
+        else:
+            raise SystemExit("%s no arrancó" % kind)
+
+        results = {}
+        peak = process_tree_hwm_kb(server.pid)
+        for name, method, url, body in routes(sizes):
+            latencies, queries, errors = [], [], [0]
+            lock = threading.Lock()
+            counter = iter(range(requests))
+
+            def worker():
+                while True:
+                    with lock:
+                        i = next(counter, None)
+                        if i is None:
+                            return
+                        target, payload = url(i), body(i) if body else None
+                    data = json.dumps(payload).encode() if payload is not None else None
+                    req = urllib.request.Request(base + target, data=data, method=method,
+                                                 headers={'Content-Type': 'application/json'})
+                    began = time.perf_counter()
+                    try:
+                        with urllib.request.urlopen(req) as response:
+                            response.read()
+                            headers = response.headers
+                    except urllib.error.HTTPError as error:
+                        error.read()
+                        headers = error.headers
+                        if error.code >= 500:
+                            with lock:
+                                errors[0] += 1
+                    elapsed = time.perf_counter() - began
+                    count = queries_from(headers)
+                    with lock:
+                        latencies.append(elapsed)
+                        if count is not None:
+                            queries.append(count)
+
+            start = time.perf_counter()
+            threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            results[name] = summarize(latencies, queries, time.perf_counter() - start, errors[0])
+            peak = add_memory(results[name], peak, process_tree_hwm_kb(server.pid))
+            print_row(name, results[name])
+        return results
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_row(name, row):
+    print("%-20s p50 %9.2f ms  p99 %9.2f ms  %9.1f req/s  %6s queries  pico +%s KB (acumulado %s KB)" % (
+        name, row['p50_ms'], row['p99_ms'], row['throughput_rps'],
+        row['queries_per_request'], row['peak_rss_growth_kb'], row['cumulative_peak_rss_kb']))
+
+
+def compare(old_path, new_path):
+    with open(old_path) as old_file, open(new_path) as new_file:
+        old, new = json.load(old_file)['results'], json.load(new_file)['results']
+    print("%-20s %12s %12s %12s %10s" % ('endpoint', 'p50 Δ%', 'p99 Δ%', 'rps Δ%', 'queries'))
+    for name in sorted(set(old) & set(new)):
+        def delta(key):
+            before, after = old[name][key], new[name][key]
+            return '%+.1f' % ((after - before) * 100.0 / before) if before else 'n/a'
+        print("%-20s %12s %12s %12s %4s -> %s" % (
+            name, delta('p50_ms'), delta('p99_ms'), delta('throughput_rps'),
+            old[name]['queries_per_request'], new[name]['queries_per_request']))
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='base descartable (por defecto un SQLite temporal)')
+    parser.add_argument('--people', type=int, default=1000)
+    parser.add_argument('--planets', type=int, default=1000)
+    parser.add_argument('--vehicles', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--likes', type=int, default=10000)
+    parser.add_argument('--requests', type=int, default=200, help='requests por endpoint')
+    parser.add_argument('--cache', default='none', choices=['none', 'memory', 'redis'], help='CACHE_BACKEND')
+    parser.add_argument('--gunicorn', dest='server', action='store_const', const='gunicorn',
+                        help='medir contra gunicorn (src/wsgi.py) en vez del test client')
+    parser.add_argument('--asgi', dest='server', action='store_const', const='asgi',
+                        help='medir contra uvicorn (src/asgi.py) en vez del test client')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('-o', '--output', help='archivo JSON de resultados')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DESPUES'), help='comparar dos resultados')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sizes = {key: getattr(args, key) for key in ('people', 'planets', 'vehicles', 'users', 'likes')}
+    database_url = args.database_url or scratch_database_url('load.db')
+    env = {'CACHE_BACKEND': args.cache}
+    api = load_app(database_url, INSTRUMENTATION='1', **env)
+    reset_schema(api)
+    started = time.perf_counter()
+    seed(api, sizes)
+    print("Sembrado en %.1f s: %s" % (time.perf_counter() - started, sizes))
+
+    if args.server:
+        with api.app.app_context():
+            api.db.engine.dispose()
+        results = run_server(args.server, database_url, sizes, args.requests, args.workers, args.concurrency, env)
+    else:
+        results = run_test_client(api, sizes, args.requests)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'mode': args.server or 'test_client',
+            'workers': args.workers if args.server else 1,
+            'concurrency': args.concurrency if args.server else 1,
+            'database': database_url.split(':', 1)[0],
+            'cache': args.cache,
+            'sizes': sizes,
+            'requests_per_endpoint': args.requests,
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        print("Resultados en %s" % args.output)
+
+
+if __name__ == '__main__':
+    main()
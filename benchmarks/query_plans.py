@@ -0,0 +1,167 @@
+"""
+Regresión de planes de consulta: recorre los endpoints de src/app.py contra una base
+descartable, captura cada sentencia SQL que emiten y corre EXPLAIN sobre las que
+tienen WHERE. Falla si alguna de esas consultas recorre una tabla entera.
+
+    $ pipenv run query-plans                                  # SQLite temporal
+    $ pipenv run query-plans postgresql://localhost/scratch   # base PostgreSQL vacía
+
+La base se crea con `flask db upgrade`, así se verifican los índices de las migraciones.
+¡Borra todas las tablas de la base indicada!
+"""
+import re
+import sys
+from common import load_app, reset_schema, scratch_database_url
+
+WHERE = re.compile(r'\bWHERE\b', re.IGNORECASE)
+
+# Todos los endpoints de la API con ids que existen en el seed de abajo.
+# Si se agrega una ruta nueva hay que sumarla acá, si no el chequeo falla.
+REQUESTS = [
+    ('GET', '/people', None),
+    ('GET', '/people?limit=2&after=MQ', None),
+    ('GET', '/people?stream=1', None),
+    ('GET', '/people/1', None),
+    ('GET', '/planets', None),
+    ('GET', '/planets?limit=2&after=MQ', None),
+    ('GET', '/people?name=Person%201', None),
+    ('GET', '/people?name_prefix=Person&limit=2', None),
+    ('GET', '/people?homeworld=Planet%202', None),
+    ('GET', '/planets/1', None),
+    ('GET', '/planets?name_prefix=Pla', None),
+    ('GET', '/planets?population_min=1500&population_max=2500', None),
+    ('GET', '/planets?climate=2', None),
+    ('GET', '/vehicles', None),
+    ('GET', '/vehicles?vehicle_class=speeder&passengers_min=1&passengers_max=2', None),
+    ('GET', '/vehicles?passengers_min=2', None),
+    ('GET', '/vehicles?fields=id,name&vehicle_class=speeder', None),
+    ('GET', '/vehicles?vehicle_class=speeder&limit=2', None),
+    ('GET', '/vehicles/1', None),
+    ('GET', '/user', None),
+    ('GET', '/user?limit=2&after=MQ', None),
+    ('POST', '/likes/planets/1/1', None),
+    ('POST', '/likes/people/1/1', None),
+    ('GET', '/user/1/likes', None),
+    ('GET', '/people/popular', None),
+    ('GET', '/planets/popular?limit=2', None),
+    ('GET', '/vehicles/popular', None),
+    ('GET', '/user/1/likes?expand=people,planets,vehicles', None),
+    ('POST', '/user/1/likes:batch', [{'type': 'people', 'id': 2}, {'type': 'planets', 'id': 2}, {'type': 'vehicles', 'id': 1}]),
+    ('DELETE', '/user/1/likes:batch', [{'type': 'people', 'id': 2}, {'type': 'vehicles', 'id': 1}]),
+    ('DELETE', '/likes/planets/1/1', None),
+    ('DELETE', '/likes/people/1/1', None),
+    ('POST', '/likes/vehicles/1/2', None),
+    ('DELETE', '/likes/vehicles/1/2', None),
+]
+
+# Búsquedas que solo tienen índice en PostgreSQL (trigram)
+POSTGRESQL_REQUESTS = [
+    ('GET', '/people?name_contains=son', None),
+    ('GET', '/planets?name_contains=net', None),
+]
+
+# Endpoints que no hace falta recorrer
+IGNORED_ENDPOINTS = {'static', 'sitemap', 'metrics', 'openapi_spec', 'swagger_redirect', 'healthz', 'readyz'}
+
+
+def setup(database_url):
+    api = load_app(database_url)
+    reset_schema(api)
+    with api.app.app_context():
+        for i in range(1, 4):
+            api.db.session.add(api.User(email='user%d@example.com' % i, password='secret%d' % i))
+            api.db.session.add(api.People(name='Person %d' % i, homeworld='Planet %d' % i))
+            api.db.session.add(api.Planets(name='Planet %d' % i, population=i * 1000, climate=i))
+            api.db.session.add(api.Vehicle(name='Vehicle %d' % i, vehicle_class='speeder', passengers=i))
+        api.db.session.commit()
+    return api
+
+
+def capture(api):
+    """Ejecuta REQUESTS y devuelve [(endpoint, sentencia, parámetros)] y los endpoints visitados."""
+    from flask import request, request_started
+    from sqlalchemy import event
+
+    statements, visited, current = [], set(), {}
+
+    def on_request(sender, **extra):
+        current['endpoint'] = request.endpoint
+        visited.add(request.endpoint)
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany:
+            statements.append((current.get('endpoint'), statement, parameters))
+
+    request_started.connect(on_request, api.app)
+    with api.app.app_context():
+        event.listen(api.db.engine, 'before_cursor_execute', on_execute)
+        client = api.app.test_client()
+        requests = REQUESTS
+        if api.db.engine.dialect.name == 'postgresql':
+            requests = REQUESTS + POSTGRESQL_REQUESTS
+        for method, url, body in requests:
+            response = client.open(url, method=method, json=body)
+            if response.status_code >= 500:
+                raise SystemExit("%s %s devolvió %d" % (method, url, response.status_code))
+        event.remove(api.db.engine, 'before_cursor_execute', on_execute)
+    return statements, visited
+
+
+def full_scans(conn, statement, parameters):
+    """Tablas que el plan recorre enteras para `statement`."""
+    if conn.dialect.name == 'sqlite':
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows if row[-1].startswith('SCAN ')]
+    if conn.dialect.name == 'postgresql':
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        scans, pending = [], [plan[0]['Plan']]
+        while pending:
+            node = pending.pop()
+            if node['Node Type'] == 'Seq Scan':
+                scans.append('Seq Scan on %s' % node['Relation Name'])
+            pending.extend(node.get('Plans', []))
+        return scans
+    raise SystemExit("Dialecto no soportado: %s" % conn.dialect.name)
+
+
+def check(api, statements, visited):
+    failures = []
+    endpoints = {rule.endpoint for rule in api.app.url_map.iter_rules()
+                 if not rule.endpoint.startswith('admin') and '.' not in rule.endpoint}
+    for endpoint in sorted(endpoints - visited - IGNORED_ENDPOINTS):
+        failures.append("%s: el endpoint no está en REQUESTS" % endpoint)
+
+    with api.app.app_context():
+        with api.db.engine.connect() as conn:
+            if conn.dialect.name == 'postgresql':
+                # Con tablas chicas el planner elige Seq Scan igual; así solo lo usa si no hay índice
+                conn.exec_driver_sql("SET enable_seqscan = off")
+            seen = set()
+            for endpoint, statement, parameters in statements:
+                if not WHERE.search(statement) or statement.lstrip().upper().startswith('INSERT'):
+                    continue
+                if (endpoint, statement) in seen:
+                    continue
+                seen.add((endpoint, statement))
+                for scan in full_scans(conn, statement, parameters):
+                    failures.append("%s: %s\n    %s" % (endpoint, scan, ' '.join(statement.split())))
+            checked = len(seen)
+    return checked, failures
+
+
+def main():
+    if len(sys.argv) > 1:
+        database_url = sys.argv[1]
+    else:
+        database_url = scratch_database_url('query_plans.db')
+    api = setup(database_url)
+    statements, visited = capture(api)
+    checked, failures = check(api, statements, visited)
+    print("%d consultas con WHERE revisadas en %d endpoints" % (checked, len(visited)))
+    for failure in failures:
+        print("FALLA " + failure)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
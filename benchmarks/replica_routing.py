@@ -0,0 +1,81 @@
+"""
+Chequeo del ruteo a réplicas (src/replicas.py) con tres archivos SQLite: una primaria y dos
+"réplicas" con datos distintos, así se ve de dónde sale cada respuesta.
+
+    $ pipenv run replica-check
+
+Verifica que los GET lean de las réplicas en round-robin, que las escrituras vayan a la
+primaria y que después de escribir el mismo cliente lea de la primaria (cookie db_primary).
+Con el cache en memoria, verifica también que lo que devuelve una réplica atrasada justo
+después de un cambio no quede cacheado ni conteste 304 cuando la réplica se pone al día.
+"""
+import os
+import sys
+import tempfile
+from sqlalchemy import create_engine, update
+from common import load_app, reset_schema
+
+
+def seed(api, engine, label):
+    """Un usuario, un personaje y un planeta cuyo nombre dice en qué base están."""
+    with engine.begin() as conn:
+        conn.execute(api.User.__table__.insert(), [{'email': 'user1@example.com', 'password': 'secret1'}])
+        conn.execute(api.People.__table__.insert(), [{'name': 'Person %s' % label}])
+        conn.execute(api.Planets.__table__.insert(), [{'name': 'Planet %s' % label}])
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    urls = {name: 'sqlite:///' + os.path.join(directory, name + '.db') for name in ('primary', 'replica_a', 'replica_b')}
+    api = load_app(urls['primary'], DATABASE_REPLICA_URLS='%s,%s' % (urls['replica_a'], urls['replica_b']),
+                   CACHE_BACKEND='memory')
+    reset_schema(api)
+    with api.app.app_context():
+        seed(api, api.db.engine, 'primary')
+    for name in ('replica_a', 'replica_b'):
+        engine = create_engine(urls[name])
+        api.db.metadata.create_all(engine)
+        seed(api, engine, name)
+        engine.dispose()
+
+    failures = []
+
+    def expect(description, actual, expected):
+        status = 'ok   ' if actual == expected else 'FALLA'
+        print("%s %s: %r" % (status, description, actual))
+        if actual != expected:
+            failures.append(description)
+
+    reader = api.app.test_client()
+    # Un ?limit= distinto en cada GET: cada uno es otra entrada del cache y llega a la base
+    names = [reader.get('/people?limit=%d' % (i + 1)).get_json()['results'][0]['name'] for i in range(4)]
+    expect("GET /people round-robin entre réplicas", names,
+           ['Person replica_a', 'Person replica_b', 'Person replica_a', 'Person replica_b'])
+
+    writer = api.app.test_client()
+    response = writer.post('/likes/people/1/1')
+    expect("POST /likes/people/1/1 en la primaria", response.status_code, 200)
+    expect("cookie de read-after-write", 'db_primary' in response.headers.get('Set-Cookie', ''), True)
+    expect("GET /user/1/likes del que escribió (primaria)", len(writer.get('/user/1/likes').get_json()), 1)
+    expect("GET /user/1/likes de otro cliente (réplica)", len(reader.get('/user/1/likes').get_json()), 0)
+
+    # La primaria cambia y las réplicas todavía no: la lectura atrasada no se cachea
+    with api.app.app_context():
+        api.db.session.execute(update(api.People).where(api.People.id == 1).values(name='Person v2'))
+        api.db.session.commit()
+    stale = reader.get('/people/1')
+    expect("GET /people/1 de una réplica atrasada", stale.get_json()['name'] in ('Person replica_a', 'Person replica_b'), True)
+    for name in ('replica_a', 'replica_b'):
+        engine = create_engine(urls[name])
+        with engine.begin() as conn:
+            conn.execute(update(api.People).where(api.People.id == 1).values(name='Person v2'))
+        engine.dispose()
+    fresh = reader.get('/people/1', headers={'If-None-Match': stale.headers['ETag']})
+    expect("GET /people/1 cuando la réplica se puso al día", (fresh.status_code, fresh.get_json()['name']),
+           (200, 'Person v2'))
+
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
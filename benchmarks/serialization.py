@@ -0,0 +1,66 @@
+"""
+Micro-benchmark de serialización de /people: filas por segundo para el camino original
+(entidades ORM + serialize() + json estándar) contra las filas Core con el serializador
+generado y orjson.
+
+    $ python benchmarks/serialization.py [cantidad_de_filas] [repeticiones]
+"""
+import sys
+from common import best_of, load_app, scratch_database_url
+
+
+def setup(rows):
+    api = load_app(scratch_database_url('serialization.db'))
+
+    with api.app.app_context():
+        api.db.create_all()
+        api.db.session.execute(api.People.__table__.insert(), [
+            {'name': 'Person %d' % i, 'birth_year': 1900 + i % 100, 'homeworld': 'Planet %d' % (i % 500), 'starship': 'X-Wing'}
+            for i in range(rows)
+        ])
+        api.db.session.commit()
+    return api
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    api = setup(rows)
+    from flask.json.provider import DefaultJSONProvider
+    from serializers import OrjsonProvider, compile_serializer, orjson, public_fields, row_serializer
+
+    std = DefaultJSONProvider(api.app)
+    fast = OrjsonProvider(api.app) if orjson is not None else std
+    People, db = api.People, api.db
+    fields = public_fields(People)
+    compiled = compile_serializer(People)
+    from_row = row_serializer(fields)
+    columns = [getattr(People, name) for name in fields]
+
+    def original():
+        db.session.expunge_all()
+        std.response([item.serialize() for item in People.query.all()])
+
+    def compiled_orm():
+        db.session.expunge_all()
+        fast.response([compiled(item) for item in People.query.all()])
+
+    def core_rows():
+        fast.response([from_row(row) for row in db.session.execute(db.select(*columns)).all()])
+
+    cases = [
+        ('ORM + serialize() + json', original),
+        ('ORM + serializador generado + %s' % ('orjson' if orjson else 'json'), compiled_orm),
+        ('filas Core + serializador generado + %s' % ('orjson' if orjson else 'json'), core_rows),
+    ]
+    with api.app.test_request_context():
+        base = None
+        for name, fn in cases:
+            elapsed = best_of(repeat, fn)
+            rate = rows / elapsed
+            base = base or rate
+            print("%-50s %10.0f filas/s  x%.1f" % (name, rate, rate / base))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Tiempo de arranque de un worker: cada medición es un proceso Python nuevo que importa
+src/app.py y llama a create_app(), como un worker de gunicorn sin --preload o un comando
+`flask`. Compara la app completa con la de wsgi.py (sin Flask-Migrate) y con un worker
+solo API (sin admin, swagger ni migraciones).
+
+    $ python benchmarks/startup.py [repeticiones] [resultado.json]
+
+Reporta mediana y mínimo en ms, y el RSS pico del proceso.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from common import SRC
+
+CHILD = """
+import resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, %r)
+from app import create_app
+create_app(**%r)
+elapsed = time.perf_counter() - start
+print('%%f %%d' %% (elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+"""
+
+VARIANTS = [
+    ('completa (flask CLI)', {}),
+    ('wsgi.py (sin migraciones)', {'migrate': False}),
+    ('solo API', {'migrate': False, 'admin': False, 'swagger': False}),
+]
+
+
+def measure(options, repeat):
+    env = dict(os.environ, DATABASE_URL='sqlite://', CACHE_BACKEND='none')
+    times, rss = [], []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', CHILD % (SRC, options)], env=env, text=True)
+        elapsed, peak = output.split()[-2:]
+        times.append(float(elapsed))
+        rss.append(int(peak))
+    return times, max(rss)
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = {}
+    for name, options in VARIANTS:
+        times, rss = measure(options, repeat)
+        results[name] = {'median_ms': statistics.median(times) * 1000, 'min_ms': min(times) * 1000, 'peak_rss_kb': rss}
+        print("%-28s mediana %8.1f ms  mínimo %8.1f ms  %8d KB" % (
+            name, results[name]['median_ms'], results[name]['min_ms'], rss))
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+"""unique favorites per user
+
+Revision ID: a1c3e5f7b9d2
+Revises: 38a305211b1b
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c3e5f7b9d2'
+down_revision = '38a305211b1b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Borrar duplicados previos (se conserva el like más antiguo) antes de crear las constraints
+    for column in ('people_id', 'planets_id', 'vehicle_id'):
+        op.execute(
+            "DELETE FROM likes WHERE {col} IS NOT NULL AND id NOT IN ("
+            "SELECT keep_id FROM (SELECT MIN(id) AS keep_id FROM likes "
+            "WHERE {col} IS NOT NULL GROUP BY user_id, {col}) AS keep)".format(col=column)
+        )
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_likes_user_people', ['user_id', 'people_id'])
+        batch_op.create_unique_constraint('uq_likes_user_planets', ['user_id', 'planets_id'])
+        batch_op.create_unique_constraint('uq_likes_user_vehicle', ['user_id', 'vehicle_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('likes', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_likes_user_vehicle', type_='unique')
+        batch_op.drop_constraint('uq_likes_user_planets', type_='unique')
+        batch_op.drop_constraint('uq_likes_user_people', type_='unique')
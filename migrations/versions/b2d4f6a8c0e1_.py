@@ -0,0 +1,29 @@
+"""index likes foreign keys
+
+Revision ID: b2d4f6a8c0e1
+Revises: a1c3e5f7b9d2
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2d4f6a8c0e1'
+down_revision = 'a1c3e5f7b9d2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # user_id está cubierto por las constraints únicas (user_id, <entidad>_id)
+    op.create_index(op.f('ix_likes_people_id'), 'likes', ['people_id'], unique=False)
+    op.create_index(op.f('ix_likes_planets_id'), 'likes', ['planets_id'], unique=False)
+    op.create_index(op.f('ix_likes_vehicle_id'), 'likes', ['vehicle_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_likes_vehicle_id'), table_name='likes')
+    op.drop_index(op.f('ix_likes_planets_id'), table_name='likes')
+    op.drop_index(op.f('ix_likes_people_id'), table_name='likes')
@@ -0,0 +1,26 @@
+"""index vehicle filters
+
+Revision ID: c3e5a7b9d1f2
+Revises: b2d4f6a8c0e1
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e5a7b9d1f2'
+down_revision = 'b2d4f6a8c0e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_vehicle_vehicle_class_passengers', 'vehicle', ['vehicle_class', 'passengers'], unique=False)
+    op.create_index(op.f('ix_vehicle_passengers'), 'vehicle', ['passengers'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_vehicle_passengers'), table_name='vehicle')
+    op.drop_index('ix_vehicle_vehicle_class_passengers', table_name='vehicle')
@@ -0,0 +1,38 @@
+"""index people and planets search filters
+
+Revision ID: d4f6b8c0e2a3
+Revises: c3e5a7b9d1f2
+Create Date: 2026-10-17 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6b8c0e2a3'
+down_revision = 'c3e5a7b9d1f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index(op.f('ix_people_homeworld'), 'people', ['homeworld'], unique=False)
+    op.create_index(op.f('ix_planets_name'), 'planets', ['name'], unique=False)
+    op.create_index(op.f('ix_planets_population'), 'planets', ['population'], unique=False)
+    op.create_index(op.f('ix_planets_climate'), 'planets', ['climate'], unique=False)
+    if op.get_bind().dialect.name == 'postgresql':
+        # Búsqueda por substring (?name_contains=, ILIKE '%x%') con índices trigram
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_people_name_trgm ON people USING gin (name gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_planets_name_trgm ON planets USING gin (name gin_trgm_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_planets_name_trgm")
+        op.execute("DROP INDEX IF EXISTS ix_people_name_trgm")
+    op.drop_index(op.f('ix_planets_climate'), table_name='planets')
+    op.drop_index(op.f('ix_planets_population'), table_name='planets')
+    op.drop_index(op.f('ix_planets_name'), table_name='planets')
+    op.drop_index(op.f('ix_people_homeworld'), table_name='people')
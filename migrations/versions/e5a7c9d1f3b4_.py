@@ -0,0 +1,44 @@
+"""like counters per entity
+
+Revision ID: e5a7c9d1f3b4
+Revises: d4f6b8c0e2a3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5a7c9d1f3b4'
+down_revision = 'd4f6b8c0e2a3'
+branch_labels = None
+depends_on = None
+
+# Tipo de la API -> columna de likes, para el backfill
+KINDS = (
+    ('people', 'people_id'),
+    ('planets', 'planets_id'),
+    ('vehicles', 'vehicle_id'),
+)
+
+
+def upgrade():
+    op.create_table('like_count',
+    sa.Column('kind', sa.String(length=50), nullable=False),
+    sa.Column('target_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('count', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('kind', 'target_id')
+    )
+    op.create_index('ix_like_count_kind_count', 'like_count', ['kind', 'count', 'target_id'], unique=False)
+    # Backfill con los favoritos que ya existen (después se puede corregir con `flask reconcile-likes`)
+    for kind, column in KINDS:
+        op.execute(
+            "INSERT INTO like_count (kind, target_id, count) "
+            "SELECT '%s', %s, COUNT(*) FROM likes WHERE %s IS NOT NULL GROUP BY %s" % (kind, column, column, column)
+        )
+
+
+def downgrade():
+    op.drop_index('ix_like_count_kind_count', table_name='like_count')
+    op.drop_table('like_count')
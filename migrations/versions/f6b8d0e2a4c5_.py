@@ -0,0 +1,29 @@
+"""pattern indexes for name prefix filters
+
+Revision ID: f6b8d0e2a4c5
+Revises: e5a7c9d1f3b4
+Create Date: 2026-10-17 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6b8d0e2a4c5'
+down_revision = 'e5a7c9d1f3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # ?name_prefix= (LIKE 'x%'): con una collation que no es C solo text_pattern_ops lo indexa
+        op.execute("CREATE INDEX ix_people_name_pattern ON people (name text_pattern_ops)")
+        op.execute("CREATE INDEX ix_planets_name_pattern ON planets (name text_pattern_ops)")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_planets_name_pattern")
+        op.execute("DROP INDEX IF EXISTS ix_people_name_pattern")
@@ -1,9 +1,11 @@
 import os
-from flask_admin import Admin
 from models import db, User, People, Vehicle, Planets, Likes
-from flask_admin.contrib.sqla import ModelView
 
 def setup_admin(app):
+    # Flask-Admin es pesado de importar: solo se carga si ENABLE_ADMIN está activo (ver app.py)
+    from flask_admin import Admin
+    from flask_admin.contrib.sqla import ModelView
+
     app.secret_key = os.environ.get('FLASK_APP_KEY', 'sample key')
     app.config['FLASK_ADMIN_SWATCH'] = 'cerulean'
     admin = Admin(app, name='4Geeks Admin', template_mode='bootstrap3')
@@ -14,6 +16,7 @@ def setup_admin(app):
     admin.add_view(ModelView(People, db.session))
     admin.add_view(ModelView(Vehicle, db.session))
     admin.add_view(ModelView(Planets, db.session))
+    # Los cambios en Likes hechos desde acá no actualizan like_count: después correr `flask reconcile-likes`
     admin.add_view(ModelView(Likes, db.session))
     # You can duplicate that line to add mew models
     # admin.add_view(ModelView(YourModelName, db.session))
\ No newline at end of file
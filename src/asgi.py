@@ -0,0 +1,355 @@
+"""
+Punto de entrada ASGI, alternativo a wsgi.py:
+
+    $ uvicorn asgi:application --app-dir src --workers 4
+
+Los listados, detalles y favoritos de los recursos de resources.py y GET /user/<id>/likes
+se atienden con handlers `async def` sobre un engine asíncrono de SQLAlchemy (asyncpg
+para PostgreSQL, aiosqlite para SQLite), así un proceso atiende miles de requests
+concurrentes sin un thread bloqueado por consulta. Responden lo mismo que las vistas de
+Flask (mismos mensajes, filtros, ?fields=, paginación, NDJSON, cache y ETags).
+
+/healthz y /readyz también son async (readyz hace el SELECT 1 con el engine async).
+
+El resto de las rutas (admin, spec OpenAPI, sitemap, :batch, /metrics...) pasa a la app Flask de
+siempre por un adaptador WSGI, que la corre en un pool de threads.
+
+    ASYNC_DATABASE_URL   URL del engine asíncrono (por defecto DATABASE_URL con el driver async)
+
+Las respuestas JSON se comprimen igual que en Flask (ver compression.py), con las variantes
+precomprimidas en el cache.
+
+Con DATABASE_REPLICA_URLS los GET leen de las réplicas round-robin, con la misma cookie de
+read-after-write que la app Flask (ver replicas.py).
+
+Requiere starlette, uvicorn, a2wsgi y el driver async de la base (asyncpg o aiosqlite).
+"""
+import itertools
+import os
+from contextlib import asynccontextmanager
+from a2wsgi import WSGIMiddleware
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.datastructures import Accept, MIMEAccept
+from werkzeug.http import http_date, parse_accept_header, parse_date, parse_etags
+from app import create_app
+from cache import body_etag, canonical_path, response_cache
+from compression import COMPRESSIBLE_MIMETYPES, compress, compression
+from database import engine_options
+from favorites import (TARGETS, count_rows, count_upsert, delete_like, insert_like, is_duplicate, parse_expand,
+                       serialize_like, user_likes_query, violated_column)
+from filters import apply_filters
+from models import User
+from pagination import keyset_query, page_args, split_page
+from replicas import PIN_COOKIE, pinned, replica_router, replica_urls
+from resources import resources
+from serializers import row_serializer
+from streaming import NDJSON_MIMETYPE, STREAM_BATCH_SIZE, stream_query, wants_stream
+from utils import APIException
+
+flask_app = create_app(migrate=False)
+
+ASYNC_DRIVERS = {
+    'postgresql': 'asyncpg',
+    'sqlite': 'aiosqlite',
+    'mysql': 'aiomysql',
+}
+
+
+def async_database_uri(database_uri):
+    """La misma base con el driver asíncrono: postgresql:// -> postgresql+asyncpg://"""
+    url = make_url(database_uri)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError("No hay driver async para %s: configurá ASYNC_DATABASE_URL" % backend)
+    return url.set(drivername='%s+%s' % (backend, ASYNC_DRIVERS[backend])).render_as_string(hide_password=False)
+
+
+database_uri = os.getenv('ASYNC_DATABASE_URL') or async_database_uri(flask_app.config['SQLALCHEMY_DATABASE_URI'])
+engine = create_async_engine(database_uri, **engine_options(database_uri, is_async=True))
+Session = async_sessionmaker(engine, expire_on_commit=False)
+dialect = engine.dialect.name
+
+replica_engines = [create_async_engine(url, **engine_options(url, is_async=True))
+                   for url in map(async_database_uri, replica_urls(flask_app.config['DATABASE_REPLICA_URLS']))]
+replica_sessions = itertools.cycle([async_sessionmaker(replica, expire_on_commit=False) for replica in replica_engines])
+
+if dialect == 'sqlite':
+    # La conexión de aiosqlite no es un sqlite3.Connection: el listener de models.py no la ve
+    @event.listens_for(engine.sync_engine, "connect")
+    def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def read_session(request):
+    """Sesión para un GET: una réplica round-robin, o la primaria si no hay réplicas
+    o si el cliente escribió hace menos de DB_REPLICA_STICKY_SECONDS."""
+    if replica_engines and not pinned(request.cookies.get(PIN_COOKIE)):
+        return next(replica_sessions)()
+    return Session()
+
+
+def pin_to_primary(response):
+    if replica_engines:
+        response.set_cookie(PIN_COOKIE, replica_router.pin_cookie_value(), max_age=replica_router.sticky_seconds,
+                            httponly=True, samesite='lax')
+    return response
+
+
+def json_response(obj, status_code=200):
+    # Mismo proveedor JSON que la app Flask (orjson si está disponible)
+    return Response(flask_app.json.dumps(obj) + "\n", status_code, media_type='application/json')
+
+
+def request_stream(request):
+    accept = parse_accept_header(request.headers.get('accept'), MIMEAccept)
+    return wants_stream(request.query_params, accept)
+
+
+def full_path(request, params):
+    # Igual que cache.request_path en Flask, para compartir claves de cache y ETags con wsgi.py
+    return canonical_path(request.scope['path'], request.query_params.multi_items(), params)
+
+
+async def cache_call(fn, *args, **kwargs):
+    """Llama al backend del cache fuera del event loop cuando es compartido (Redis: round
+    trips de red bloqueantes); el de memoria responde sin esperar y se llama directo."""
+    if response_cache.shared:
+        return await run_in_threadpool(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+async def encoded_response(request, status, mimetype, body, key=None):
+    """Respuesta con el cuerpo comprimido según Accept-Encoding; con `key` la variante
+    comprimida sale del cache (o se guarda ahí), como en cache.cached. Comprimir (y el
+    backend del cache) corre en el pool de threads para no frenar el event loop."""
+    response = Response(body, status, media_type=mimetype)
+    if mimetype in COMPRESSIBLE_MIMETYPES:
+        response.headers['Vary'] = 'Accept-Encoding'
+    accept = parse_accept_header(request.headers.get('accept-encoding'), Accept)
+    encoding = compression.negotiate(accept, mimetype, len(body))
+    if encoding is not None:
+        if key is not None and response_cache.persistent:
+            response.body = await run_in_threadpool(compression.cached_variant, response_cache.backend, key, body, encoding)
+        else:
+            response.body = await run_in_threadpool(compress, body, encoding)
+        response.headers['Content-Encoding'] = encoding
+        response.headers['Content-Length'] = str(len(response.body))
+    return response
+
+
+def conditional(*tables, cache=None, params=()):
+    """Versión async de cache.conditional + cache.cached: 304 sin tocar la base si el cliente
+    ya tiene la versión actual de `tables`, y cache de la respuesta 200 por tabla `cache`.
+    Sin un backend compartido, o mientras una réplica puede estar atrasada, el ETag es el del
+    cuerpo, como en cache.body_conditional."""
+    def decorator(handler):
+        async def wrapper(request):
+            path, stream = full_path(request, params), request_stream(request)
+            if_none_match = parse_etags(request.headers.get('if-none-match'))
+            etag = last_modified = None
+            replica_read = bool(replica_engines) and not pinned(request.cookies.get(PIN_COOKIE))
+            settling = await cache_call(response_cache.settling, tables, replica_read)
+            if response_cache.shared and not settling:
+                etag, last_modified = await cache_call(response_cache.validators, tables, path, stream)
+                if request.headers.get('if-none-match'):
+                    not_modified = if_none_match.contains_weak(etag)
+                else:
+                    since = parse_date(request.headers.get('if-modified-since'))
+                    not_modified = since is not None and since >= last_modified
+                if not_modified:
+                    return validated(Response(status_code=304), etag, last_modified)
+            key = None
+            if cache and not stream and not settling and response_cache.persistent:
+                key = await cache_call(response_cache.key_for, cache, full_path=path)
+            hit = await cache_call(response_cache.backend.get, key) if key else None
+            if hit is None:
+                response = await handler(request)
+                if response.status_code != 200:
+                    return response
+                if isinstance(response, StreamingResponse):
+                    return validated(response, etag, last_modified)
+                hit = (response.status_code, response.media_type, response.body, body_etag(response.body))
+                if key:
+                    await cache_call(response_cache.backend.set, key, hit)
+            if etag is None:
+                etag = hit[3]
+                if if_none_match.contains_weak(etag):
+                    return validated(Response(status_code=304), etag)
+            return validated(await encoded_response(request, *hit[:3], key=key), etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def validated(response, etag, last_modified=None):
+    if etag is not None:
+        # Las respuestas comprimidas son otra representación: ETag débil
+        weak = 'content-encoding' in response.headers
+        response.headers['ETag'] = '%s"%s"' % ('W/' if weak else '', etag)
+    if last_modified is not None:
+        response.headers['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+# ---- recursos -----------------------------------------------------------------------
+
+def resource_routes(resource):
+    """Rutas async de un recurso de resources.py (solo si serialize() devuelve columnas)."""
+    model = resource.model
+
+    async def list_endpoint(request):
+        args = request.query_params
+        fields = resource.list_fields(args)
+        query = apply_filters(select(*resource.projected_columns(fields)), resource.filters, args, dialect)
+        serialize = row_serializer(fields)
+        if request_stream(request):
+            query = stream_query(query, model, args).execution_options(yield_per=STREAM_BATCH_SIZE)
+
+            async def generate():
+                async with read_session(request) as session:
+                    result = await session.stream(query)
+                    async for row in result:
+                        yield flask_app.json.dumps(serialize(row)) + "\n"
+
+            return StreamingResponse(generate(), media_type=NDJSON_MIMETYPE)
+        limit, after = page_args(args)
+        async with read_session(request) as session:
+            if limit is None:
+                rows = (await session.execute(query)).all()
+                return json_response([serialize(row) for row in rows])
+            rows = (await session.execute(keyset_query(query, model, limit, after))).all()
+        rows, next_cursor = split_page(rows, limit)
+        return json_response({"results": [serialize(row) for row in rows], "next": next_cursor})
+
+    async def detail_endpoint(request):
+        query = select(*resource.projected_columns(resource.fields)).where(model.id == request.path_params['item_id'])
+        async with read_session(request) as session:
+            row = (await session.execute(query)).first()
+        if row is None:
+            return json_response(resource.not_found_message(), 404)
+        return json_response(row_serializer(resource.fields)(row))
+
+    async def add_like_endpoint(request):
+        user_id, item_id = request.path_params['user_id'], request.path_params['item_id']
+        async with Session() as session:
+            body, status = resource.add_like_message(await add_like(session, user_id, resource.like_column, item_id))
+        return pin_to_primary(json_response(body, status))
+
+    async def remove_like_endpoint(request):
+        user_id, item_id = request.path_params['user_id'], request.path_params['item_id']
+        async with Session() as session:
+            result = await session.execute(delete_like(user_id, resource.like_column, item_id))
+            if result.rowcount:
+                await session.execute(count_upsert(dialect), count_rows({(resource.like_column, item_id): -1}))
+            await session.commit()
+            if result.rowcount > 0:
+                body, status = resource.remove_like_message(True)
+            else:
+                # Solo cuando no se borró nada se consulta si el usuario existe, para el mensaje
+                body, status = resource.remove_like_message(False, await session.get(User, user_id) is not None)
+        return pin_to_primary(json_response(body, status))
+
+    routes = []
+    if 'list' in resource.routes:
+        routes.append(Route('/%s' % resource.path,
+                            conditional(resource.table, cache=resource.table, params=resource.list_params)(list_endpoint),
+                            methods=['GET']))
+    if 'detail' in resource.routes:
+        routes.append(Route('/%s/{item_id:int}' % resource.path,
+                            conditional(resource.table, cache=resource.table)(detail_endpoint), methods=['GET']))
+    if 'likes' in resource.routes:
+        path = '/likes/%s/{user_id:int}/{item_id:int}' % resource.path
+        routes.append(Route(path, add_like_endpoint, methods=['POST']))
+        routes.append(Route(path, remove_like_endpoint, methods=['DELETE']))
+    return routes
+
+
+async def add_like(session, user_id, column, target_id):
+    """Igual que favorites.add_like, con la sesión async."""
+    values = {'user_id': user_id, column: target_id}
+    try:
+        result = await session.execute(insert_like(dialect).values(**values))
+        if result.rowcount:
+            await session.execute(count_upsert(dialect), count_rows({(column, target_id): 1}))
+        await session.commit()
+    except IntegrityError as error:
+        await session.rollback()
+        if is_duplicate(error):
+            return 'exists'
+        missing = violated_column(error, values)
+        if missing is None:
+            missing = column if await session.get(TARGETS[column], target_id) is None else 'user_id'
+        return missing
+    if result.rowcount == 0:
+        return 'exists'
+    return None
+
+
+# ---- favoritos del usuario ----------------------------------------------------------
+
+@conditional('likes', *resources.like_tables(), params=('expand',))
+async def user_likes_endpoint(request):
+    expand = parse_expand(request.query_params.get('expand'))
+    async with read_session(request) as session:
+        likes = (await session.scalars(user_likes_query(request.path_params['user_id'], expand))).all()
+    return json_response([serialize_like(like, expand) for like in likes])
+
+
+# ---- health checks ------------------------------------------------------------------
+
+async def healthz_endpoint(request):
+    return json_response({"status": "ok"})
+
+
+async def readyz_endpoint(request):
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+    except Exception as error:
+        flask_app.logger.warning("readyz: la base no responde: %s", error)
+        return json_response({"status": "unavailable"}, 503)
+    return json_response({"status": "ok"})
+
+
+async def handle_invalid_usage(request, error):
+    return json_response(error.to_dict(), error.status_code)
+
+
+def async_routes():
+    routes = []
+    for resource in resources.resources.values():
+        # Los recursos que serializan algo más que columnas siguen por las vistas de Flask
+        if resource.column_fields == resource.fields:
+            routes += resource_routes(resource)
+    routes.append(Route('/user/{user_id:int}/likes', user_likes_endpoint, methods=['GET']))
+    routes.append(Route('/healthz', healthz_endpoint, methods=['GET']))
+    routes.append(Route('/readyz', readyz_endpoint, methods=['GET']))
+    # Lo que no matchea arriba (o matchea con otro método) cae en la app Flask
+    routes.append(Mount('/', app=WSGIMiddleware(flask_app)))
+    return routes
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
+
+application = Starlette(
+    routes=async_routes(),
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    exception_handlers={APIException: handle_invalid_usage},
+    lifespan=lifespan,
+)
@@ -0,0 +1,368 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from compression import compression, encode
+from replicas import replica_router
+from streaming import wants_stream
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+_STARTED_AT = time.time()
+
+
+def _size(value):
+    # Bytes que ocupa una entrada: el cuerpo plano (status, mimetype, body) o una variante comprimida
+    if isinstance(value, tuple):
+        return sum(len(item) for item in value if isinstance(item, (bytes, str)))
+    return len(value)
+
+
+class MemoryBackend:
+    """LRU con TTL dentro del proceso. Cada worker de gunicorn tiene el suyo,
+    por eso lo que otro worker modifica puede verse hasta `ttl` segundos tarde.
+    Se limita por cantidad de entradas y por bytes: un cuerpo más grande que
+    `maxbytes` no se guarda.
+
+    Las versiones también son del proceso: un commit en otro worker o en un comando
+    `flask` no las cambia. Por eso no sirven para ETags (ver ResponseCache.shared)."""
+    shared = False
+
+    def __init__(self, maxsize=1024, ttl=300, maxbytes=64 * 1024 * 1024):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value, size = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                self.nbytes -= size
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = _size(value)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            if size > self.maxbytes:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value, size)
+            self.nbytes += size
+            while len(self._data) > self.maxsize or self.nbytes > self.maxbytes:
+                self.nbytes -= self._data.popitem(last=False)[1][2]
+
+    def get_versions(self, tables):
+        # [(número de versión, momento del último cambio conocido)] en el orden de `tables`
+        with self._lock:
+            return [self._versions.setdefault(table, (0, time.time())) for table in tables]
+
+    def bump_version(self, table):
+        with self._lock:
+            number = self._versions.get(table, (0, None))[0]
+            self._versions[table] = (number + 1, time.time())
+
+
+class RedisBackend:
+    """Guarda respuestas y versiones en Redis (o cualquier servidor compatible),
+    compartidos entre todos los workers.
+
+    Nada se guarda con pickle (quien pudiera escribir en Redis ejecutaría código en los
+    workers): cada entrada es un hash con el cuerpo en bytes y los demás campos como texto,
+    o con un solo campo `raw` para las variantes comprimidas."""
+    shared = True
+
+    def __init__(self, url, ttl=300, prefix='swapi'):
+        if redis is None:
+            raise RuntimeError("CACHE_BACKEND=redis requiere el paquete 'redis'")
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        fields = self.client.hgetall(self.prefix + ':resp:' + key)
+        if not fields:
+            return None
+        if b'raw' in fields:
+            return fields[b'raw']
+        return (int(fields[b'status']), fields[b'mimetype'].decode(), fields[b'body'], fields[b'etag'].decode())
+
+    def set(self, key, value):
+        if isinstance(value, bytes):
+            mapping = {'raw': value}
+        else:
+            status, mimetype, body, etag = value
+            mapping = {'status': status, 'mimetype': mimetype, 'body': body, 'etag': etag}
+        redis_key = self.prefix + ':resp:' + key
+        pipe = self.client.pipeline()
+        pipe.delete(redis_key)
+        pipe.hset(redis_key, mapping=mapping)
+        pipe.expire(redis_key, self.ttl)
+        pipe.execute()
+
+    def get_versions(self, tables):
+        # Un solo MGET para todas las tablas; el SETNX del momento inicial solo si falta
+        keys = []
+        for table in tables:
+            keys += [self.prefix + ':ver:' + table, self.prefix + ':ver_ts:' + table]
+        values = self.client.mget(keys)
+        missing = [keys[index + 1] for index in range(0, len(keys), 2) if values[index + 1] is None]
+        if missing:
+            pipe = self.client.pipeline()
+            for ts_key in missing:
+                pipe.setnx(ts_key, time.time())
+            pipe.execute()
+            values = self.client.mget(keys)
+        return [(int(values[index] or 0), float(values[index + 1])) for index in range(0, len(keys), 2)]
+
+    def bump_version(self, table):
+        pipe = self.client.pipeline()
+        pipe.incr(self.prefix + ':ver:' + table)
+        pipe.set(self.prefix + ':ver_ts:' + table, time.time())
+        pipe.execute()
+
+
+class NullBackend:
+    shared = False
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def get_versions(self, tables):
+        return [(0, _STARTED_AT)] * len(tables)
+
+    def bump_version(self, table):
+        pass
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = NullBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', os.getenv('CACHE_BACKEND', 'memory'))
+        app.config.setdefault('CACHE_REDIS_URL', os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        app.config.setdefault('CACHE_TTL', int(os.getenv('CACHE_TTL', 300)))
+        app.config.setdefault('CACHE_MAXSIZE', int(os.getenv('CACHE_MAXSIZE', 1024)))
+        app.config.setdefault('CACHE_MAXBYTES', int(os.getenv('CACHE_MAXBYTES', 64 * 1024 * 1024)))
+
+        kind = app.config['CACHE_BACKEND']
+        if kind == 'memory':
+            self.backend = MemoryBackend(app.config['CACHE_MAXSIZE'], app.config['CACHE_TTL'],
+                                         app.config['CACHE_MAXBYTES'])
+        elif kind == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'], app.config['CACHE_TTL'])
+        elif kind in ('none', 'null'):
+            self.backend = NullBackend()
+        else:
+            raise RuntimeError("CACHE_BACKEND desconocido: %s" % kind)
+
+        if not event.contains(Session, 'after_commit', _after_commit):
+            event.listen(Session, 'after_flush', _after_flush)
+            event.listen(Session, 'do_orm_execute', _do_orm_execute)
+            event.listen(Session, 'after_commit', _after_commit)
+            event.listen(Session, 'after_rollback', _after_rollback)
+        app.extensions['response_cache'] = self
+
+    @property
+    def persistent(self):
+        # Con NullBackend no vale la pena pasar por el cache (ni precomprimir)
+        return not isinstance(self.backend, NullBackend)
+
+    @property
+    def shared(self):
+        """True si las versiones de las tablas las ven todos los procesos (Redis): solo entonces
+        el ETag sale de la versión y se contesta 304 sin ejecutar la vista. Si no, el ETag es
+        un hash del cuerpo (ver body_etag) y vence con él, a lo sumo en CACHE_TTL."""
+        return self.backend.shared
+
+    def settling(self, tables, replica_read=None):
+        """True si el request lee de una réplica y alguna de `tables` cambió hace menos de
+        DB_REPLICA_STICKY_SECONDS: la réplica puede no tener el cambio todavía, así que la
+        respuesta no se cachea ni lleva el ETag de la versión nueva. `replica_read` por
+        defecto sale del request de Flask (asgi.py lo pasa)."""
+        if replica_read is None:
+            replica_read = replica_router.read_only_request()
+        if not replica_read:
+            return False
+        horizon = time.time() - replica_router.sticky_seconds
+        return any(changed > horizon for number, changed in self.backend.get_versions(tables))
+
+    def key_for(self, *tables, full_path):
+        # La versión de cada tabla forma parte de la clave: al invalidar no hace falta borrar nada.
+        # `full_path` es el de canonical_path(), no el del request.
+        versions = ",".join("%s:%d" % (table, version[0])
+                            for table, version in zip(tables, self.backend.get_versions(tables)))
+        return "%s|%s" % (versions, full_path)
+
+    def validators(self, tables, full_path, stream=None):
+        """ETag fuerte y Last-Modified para `full_path` (el de canonical_path()), sin tocar la
+        base de datos. Fuera de Flask (asgi.py) se pasa también si se pidió NDJSON."""
+        if stream is None:
+            stream = wants_stream()
+        versions = self.backend.get_versions(tables)
+        variant = 'ndjson' if stream else 'json'
+        tag_source = "%s|%s|%s" % (
+            ",".join("%s.%d" % (table, ver[0]) for table, ver in zip(tables, versions)),
+            full_path,
+            variant,
+        )
+        etag = hashlib.sha1(tag_source.encode()).hexdigest()
+        last_modified = datetime.fromtimestamp(math.ceil(max(ver[1] for ver in versions)), timezone.utc)
+        return etag, last_modified
+
+    def invalidate(self, *tables):
+        for table in tables:
+            self.backend.bump_version(table)
+
+
+response_cache = ResponseCache()
+
+
+# Las tablas modificadas se juntan en session.info y recién se invalidan al hacer commit,
+# así un rollback no tira el cache. Vale también para los ModelView de Flask-Admin.
+def _pending_tables(session):
+    return session.info.setdefault('changed_tables', set())
+
+def _after_flush(session, flush_context):
+    tables = _pending_tables(session)
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, '__table__', None)
+        if table is not None:
+            tables.add(table.name)
+
+def _do_orm_execute(orm_execute_state):
+    # insert()/update()/delete() ejecutados con db.session.execute no pasan por el flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None:
+            _pending_tables(orm_execute_state.session).add(table.name)
+
+def _after_commit(session):
+    tables = session.info.pop('changed_tables', None)
+    if tables:
+        response_cache.invalidate(*tables)
+
+def _after_rollback(session):
+    session.info.pop('changed_tables', None)
+
+
+def canonical_path(path, args, params):
+    """Ruta con solo los parámetros `params` del query string (los que lee la vista), ordenados
+    por nombre. `args` son los pares (nombre, valor) del request. Así ?junk=1 o el orden de los
+    parámetros no crean otra entrada en el cache ni cambian el ETag."""
+    query = urlencode(sorted(((name, value) for name, value in args if name in params), key=lambda pair: pair[0]))
+    return "%s?%s" % (path, query)
+
+
+def body_etag(body):
+    return hashlib.sha1(body).hexdigest()
+
+
+def request_path(params):
+    return canonical_path(request.path, request.args.items(multi=True), params)
+
+
+def cached(*tables, params=()):
+    """Cachea la respuesta 200 de una vista GET por ruta y los parámetros `params`.
+    Se invalida sola cuando se commitea un cambio en cualquiera de `tables`.
+    Las variantes comprimidas (gzip, br, zstd) se guardan junto al cuerpo plano, y el ETag
+    del cuerpo (body_etag) se calcula una vez y se guarda con él."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if (request.method != 'GET' or wants_stream() or not response_cache.persistent
+                    or response_cache.settling(tables)):
+                return view(*args, **kwargs)
+            key = response_cache.key_for(*tables, full_path=request_path(params))
+            hit = response_cache.backend.get(key)
+            if hit is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                body = response.get_data()
+                hit = (response.status_code, response.mimetype, body, body_etag(body))
+                response_cache.backend.set(key, hit)
+            status, mimetype, body, etag = hit
+            response = current_app.response_class(body, status=status, mimetype=mimetype)
+            response.set_etag(etag)
+            encoding = compression.negotiate(request.accept_encodings, mimetype, len(body))
+            if encoding is not None:
+                encode(response, compression.cached_variant(response_cache.backend, key, body, encoding), encoding)
+            return response
+        return wrapper
+    return decorator
+
+
+def conditional(*tables, params=()):
+    """Agrega ETag/Last-Modified a la respuesta y contesta 304 sin ejecutar la vista
+    si el cliente ya tiene la versión actual de `tables`. `params` como en cached().
+
+    Sin un backend compartido (ResponseCache.shared), o mientras una réplica puede estar
+    atrasada (ResponseCache.settling), el ETag es el del cuerpo: la vista (o el cache) se
+    ejecuta igual y el 304 solo ahorra la transferencia."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            if not response_cache.shared or response_cache.settling(tables):
+                return body_conditional(current_app.make_response(view(*args, **kwargs)))
+            etag, last_modified = response_cache.validators(tables, request_path(params))
+            if request.if_none_match:
+                # Comparación débil: las respuestas comprimidas llevan W/"etag"
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = request.if_modified_since is not None and request.if_modified_since >= last_modified
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak='Content-Encoding' in response.headers)
+            response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def body_conditional(response):
+    """ETag del cuerpo de `response` (el que guardó cached(), o se calcula) y 304 si coincide.
+    Las respuestas en streaming salen sin ETag: no se conoce el cuerpo de antemano."""
+    if response.status_code != 200 or response.is_streamed:
+        return response
+    etag, weak = response.get_etag()
+    if etag is None:
+        etag = body_etag(response.get_data())
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    response.set_etag(etag, weak=weak or 'Content-Encoding' in response.headers)
+    return response
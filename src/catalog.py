@@ -0,0 +1,237 @@
+"""
+Carga y descarga masiva del catálogo (personajes, planetas, vehículos):
+
+    $ flask catalog import people personajes.csv
+    $ flask catalog import planets planetas.ndjson --batch-size 20000
+    $ flask catalog export vehicles vehiculos.csv
+    $ flask catalog export people - --format ndjson | gzip > personajes.ndjson.gz
+
+El formato sale de la extensión (.csv, .ndjson/.jsonl) o de --format. Las columnas son las de
+la tabla; `id` es opcional al importar (si viene se respeta, así se conservan los favoritos).
+
+La importación lee el archivo de a lotes de --batch-size filas y hace un commit por lote, así la
+memoria no depende del tamaño del archivo. En PostgreSQL (psycopg2) cada lote entra con
+COPY ... FROM STDIN; en el resto con un executemany del INSERT. La exportación usa un cursor del
+lado del servidor (yield_per). El progreso se informa por stderr.
+
+La importación invalida el cache de respuestas desde el proceso del comando: solo los workers
+con CACHE_BACKEND=redis se enteran en el momento. Con el cache en memoria (el de por defecto)
+cada worker sigue sirviendo lo que ya tenía cacheado hasta CACHE_TTL.
+"""
+import contextlib
+import csv
+import io
+import json
+import sys
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, select, text
+from cache import response_cache
+from models import db
+from resources import resources
+
+DEFAULT_BATCH_SIZE = 10000
+FORMATS = ('csv', 'ndjson')
+EXTENSIONS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson'}
+
+catalog_cli = AppGroup('catalog', help='Importa y exporta el catálogo en CSV o NDJSON.')
+
+
+def catalog_table(name):
+    """Tabla de un recurso del catálogo (los que se pueden marcar como favoritos)."""
+    resource = resources.resources.get(name)
+    if resource is None or resource.like_column is None:
+        names = [path for path, resource in resources.resources.items() if resource.like_column is not None]
+        raise click.BadParameter("usar uno de: %s" % ", ".join(names), param_hint='RESOURCE')
+    return resource.model.__table__
+
+
+def file_format(path, fmt):
+    if fmt is not None:
+        return fmt
+    for extension, name in EXTENSIONS.items():
+        if path.endswith(extension):
+            return name
+    raise click.BadParameter("no se reconoce la extensión, indicar --format", param_hint='FILE')
+
+
+def open_stream(path, mode):
+    # '-' es stdin/stdout; los archivos con newline='' como pide el módulo csv
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def defaulted_columns(table):
+    """Columnas que la base completa sola si no vienen: la primary key y las que tienen default."""
+    return {name for name, column in table.columns.items()
+            if column.primary_key or column.default is not None or column.server_default is not None}
+
+
+def batches(rows, size, columns=None, defaulted=()):
+    """Lotes de hasta `size` filas. Con `columns` (el orden de la tabla) todas las filas de un
+    lote quedan con las mismas claves, como piden executemany y COPY: las que falten van en NULL,
+    salvo las de `defaulted`, que no se completan nunca (un id NULL explícito rompe el NOT NULL).
+    Por eso un bloque de `size` filas se parte en un lote por cada combinación de columnas de
+    `defaulted` presentes, por ejemplo las filas con id y las sin id."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield from _same_keys(batch, columns, defaulted)
+            batch = []
+    if batch:
+        yield from _same_keys(batch, columns, defaulted)
+
+
+def _same_keys(batch, columns, defaulted):
+    if columns is None:
+        yield batch
+        return
+    groups = {}
+    for row in batch:
+        groups.setdefault(frozenset(name for name in defaulted if name in row), []).append(row)
+    # Primero las filas con id: las que no lo traen toman valores de la secuencia ya ajustada
+    for given, group in sorted(groups.items(), key=lambda item: -len(item[0])):
+        present = set().union(*group)
+        names = [name for name in columns if name in present and (name not in defaulted or name in given)]
+        yield [{name: row.get(name) for name in names} for row in group]
+
+
+class Progress:
+    def __init__(self, label):
+        self.label = label
+        self.rows = 0
+        self.started = time.perf_counter()
+
+    def add(self, count):
+        self.rows += count
+        elapsed = time.perf_counter() - self.started
+        click.echo("%s: %d filas (%.0f filas/s)" % (self.label, self.rows, self.rows / max(elapsed, 1e-9)), err=True)
+
+
+# ---- import -------------------------------------------------------------------------
+
+def read_rows(stream, fmt, table):
+    """Filas del archivo como dicts de columna -> valor, convertidas al tipo de la columna.
+    Cada fila trae solo las columnas que aparecen en su registro (en NDJSON pueden variar de
+    una línea a otra); batches() completa las que falten. Un id (o una columna con default)
+    vacío o null queda afuera de la fila, así lo asigna la base."""
+    records = csv.DictReader(stream) if fmt == 'csv' else (json.loads(line) for line in stream if line.strip())
+    converters = {name: _converter(column) for name, column in table.columns.items()}
+    defaulted = defaulted_columns(table)
+    for record in records:
+        unknown = [name for name in record if name not in converters]
+        if unknown:
+            raise click.ClickException("columnas desconocidas para %s: %s" % (table.name, ", ".join(unknown)))
+        row = {name: converters[name](value) for name, value in record.items()}
+        yield {name: value for name, value in row.items() if value is not None or name not in defaulted}
+
+
+def _converter(column):
+    python_type = column.type.python_type
+
+    def convert(value):
+        # En CSV todo es texto: la celda vacía es NULL
+        if value is None or value == '':
+            return None
+        return python_type(value)
+    return convert
+
+
+def copy_batch(connection, table, columns, batch):
+    """COPY ... FROM STDIN de un lote (PostgreSQL con psycopg2)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in batch:
+        # En COPY ... csv el campo vacío sin comillas es NULL
+        writer.writerow(['' if row[name] is None else row[name] for name in columns])
+    buffer.seek(0)
+    cursor = connection.connection.driver_connection.cursor()
+    try:
+        cursor.copy_expert('COPY %s (%s) FROM STDIN WITH (FORMAT csv)' % (
+            table.name, ", ".join(columns)), buffer)
+    finally:
+        cursor.close()
+
+
+def uses_copy(connection):
+    return connection.dialect.name == 'postgresql' and connection.dialect.driver == 'psycopg2'
+
+
+def import_rows(table, rows, batch_size=DEFAULT_BATCH_SIZE, use_copy=True, progress=None):
+    """Inserta `rows` de a lotes, un commit por lote. Devuelve la cantidad de filas."""
+    total = 0
+    copy = None
+    for batch in batches(rows, batch_size, list(table.columns.keys()), defaulted_columns(table)):
+        connection = db.session.connection()
+        if copy is None:
+            copy = use_copy and uses_copy(connection)
+        if copy:
+            copy_batch(connection, table, list(batch[0]), batch)
+        else:
+            db.session.execute(table.insert(), batch)
+        if 'id' in batch[0] and connection.dialect.name == 'postgresql':
+            # Con ids explícitos la secuencia tiene que seguir desde el mayor antes del próximo
+            # lote, que puede traer filas sin id
+            db.session.execute(text("SELECT setval(pg_get_serial_sequence(:table, 'id'), :max_id)"), {
+                'table': table.name, 'max_id': db.session.scalar(select(func.max(table.c.id))),
+            })
+        db.session.commit()
+        total += len(batch)
+        if progress is not None:
+            progress.add(len(batch))
+    if copy:
+        # COPY no pasa por la sesión: el cache no se entera solo
+        response_cache.invalidate(table.name)
+    return total
+
+
+@catalog_cli.command('import')
+@click.argument('resource')
+@click.argument('path', metavar='FILE')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='por defecto según la extensión')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='filas por lote')
+@click.option('--copy/--no-copy', 'use_copy', default=True, help='usar COPY en PostgreSQL')
+def import_command(resource, path, fmt, batch_size, use_copy):
+    """Importa RESOURCE (people, planets, vehicles) desde FILE ('-' es stdin)."""
+    table = catalog_table(resource)
+    fmt = file_format(path, fmt) if path != '-' else (fmt or 'ndjson')
+    with open_stream(path, 'r') as stream:
+        total = import_rows(table, read_rows(stream, fmt, table), batch_size, use_copy, Progress(resource))
+    click.echo("%s: %d filas importadas" % (resource, total), err=True)
+
+
+# ---- export -------------------------------------------------------------------------
+
+def export_rows(table, batch_size=DEFAULT_BATCH_SIZE):
+    """Filas de la tabla en orden de id, leídas con un cursor del lado del servidor."""
+    query = select(table).order_by(table.c.id).execution_options(yield_per=batch_size)
+    return db.session.execute(query)
+
+
+@catalog_cli.command('export')
+@click.argument('resource')
+@click.argument('path', metavar='FILE', default='-')
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help='por defecto según la extensión')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='filas por lote del cursor')
+def export_command(resource, path, fmt, batch_size):
+    """Exporta RESOURCE (people, planets, vehicles) a FILE (por defecto stdout)."""
+    table = catalog_table(resource)
+    fmt = file_format(path, fmt) if path != '-' else (fmt or 'ndjson')
+    columns = list(table.columns.keys())
+    progress = Progress(resource)
+    result = export_rows(table, batch_size)
+    with open_stream(path, 'w') as stream:
+        if fmt == 'csv':
+            writer = csv.writer(stream)
+            writer.writerow(columns)
+        for partition in result.partitions():
+            if fmt == 'csv':
+                writer.writerows(partition)
+            else:
+                stream.writelines(current_app.json.dumps(dict(zip(columns, row))) + "\n" for row in partition)
+            progress.add(len(partition))
+    click.echo("%s: %d filas exportadas" % (resource, progress.rows), err=True)
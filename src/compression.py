@@ -0,0 +1,124 @@
+"""
+Compresión negociada de las respuestas JSON (Accept-Encoding): zstd, brotli o gzip, en ese
+orden de preferencia ante la misma calidad. gzip siempre está; brotli y zstd solo si están
+instalados los paquetes `brotli` y `zstandard`.
+
+    COMPRESSION=1            0 la apaga
+    COMPRESSION_MIN_SIZE=1024  bytes: las respuestas más chicas salen sin comprimir
+
+Las respuestas cacheables (cache.cached) guardan cada variante comprimida en el cache junto al
+cuerpo plano, con un nivel de compresión más alto porque se comprime una sola vez; las demás se
+comprimen en after_request con un nivel rápido. Las respuestas comprimidas llevan ETag débil
+(W/"...") y Vary: Accept-Encoding. El NDJSON en streaming no se comprime.
+"""
+import gzip
+import os
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSIBLE_MIMETYPES = ('application/json',)
+
+# Nivel (al vuelo, para guardar en cache) por codificación
+LEVELS = {
+    'gzip': (6, 9),
+    'br': (4, 9),
+    'zstd': (3, 12),
+}
+
+
+def _gzip(body, level):
+    # mtime=0: la misma entrada da siempre los mismos bytes
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def _brotli(body, level):
+    return brotli.compress(body, quality=level, mode=brotli.MODE_TEXT)
+
+
+def _zstd(body, level):
+    return zstandard.ZstdCompressor(level=level).compress(body)
+
+
+ENCODERS = {'gzip': _gzip}
+if brotli is not None:
+    ENCODERS['br'] = _brotli
+if zstandard is not None:
+    ENCODERS['zstd'] = _zstd
+PREFERENCE = [name for name in ('zstd', 'br', 'gzip') if name in ENCODERS]
+
+
+def compress(body, encoding, cached=False):
+    return ENCODERS[encoding](body, LEVELS[encoding][1 if cached else 0])
+
+
+class Compression:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.min_size = 1024
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESSION', os.getenv('COMPRESSION', '1') in ('1', 'true'))
+        app.config.setdefault('COMPRESSION_MIN_SIZE', int(os.getenv('COMPRESSION_MIN_SIZE', 1024)))
+        self.enabled = app.config['COMPRESSION']
+        self.min_size = app.config['COMPRESSION_MIN_SIZE']
+        if self.enabled:
+            app.after_request(self._after_request)
+        app.extensions['compression'] = self
+
+    def negotiate(self, accept_encoding, mimetype, size):
+        """Codificación a usar para un cuerpo de `size` bytes, o None.
+        `accept_encoding` es el header ya parseado (werkzeug Accept)."""
+        if not self.enabled or mimetype not in COMPRESSIBLE_MIMETYPES or size < self.min_size:
+            return None
+        best, best_quality = None, 0
+        for encoding in PREFERENCE:
+            quality = accept_encoding[encoding]
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def cached_variant(self, backend, key, body, encoding):
+        """Cuerpo comprimido guardado junto al plano bajo `key`; se comprime solo la primera vez."""
+        variant_key = "%s|%s" % (key, encoding)
+        compressed = backend.get(variant_key)
+        if compressed is None:
+            compressed = compress(body, encoding, cached=True)
+            backend.set(variant_key, compressed)
+        return compressed
+
+    def _after_request(self, response):
+        if response.mimetype in COMPRESSIBLE_MIMETYPES:
+            response.vary.add('Accept-Encoding')
+        if (response.direct_passthrough or response.is_streamed or 'Content-Encoding' in response.headers
+                or not 200 <= response.status_code < 300):
+            return response
+        body = response.get_data()
+        encoding = self.negotiate(request.accept_encodings, response.mimetype, len(body))
+        if encoding is not None:
+            encode(response, compress(body, encoding), encoding)
+        return response
+
+
+def encode(response, body, encoding):
+    """Pone `body` ya comprimido con `encoding` en la respuesta de Flask."""
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        # Otra representación de los mismos datos: el ETag fuerte no puede ser el mismo
+        response.set_etag(etag, weak=True)
+
+
+compression = Compression()
@@ -0,0 +1,141 @@
+"""
+Configuración del engine de SQLAlchemy desde variables de entorno.
+
+    DB_POOL_SIZE=5              conexiones permanentes por worker
+    DB_MAX_OVERFLOW=10          conexiones extra en picos
+    DB_POOL_TIMEOUT=30          segundos esperando una conexión libre antes de fallar
+    DB_POOL_RECYCLE=1800        segundos antes de reabrir una conexión (0 = nunca)
+    DB_POOL_PRE_PING=1          verifica la conexión al sacarla del pool (sobrevive failovers)
+    DB_STATEMENT_TIMEOUT_MS=0   corta consultas más largas (PostgreSQL y MySQL)
+    DB_PGBOUNCER=0              modo PgBouncer: sin pool propio y sin prepared statements
+"""
+import os
+import threading
+import time
+import weakref
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name, default):
+    return os.getenv(name, default) in ('1', 'true', 'True')
+
+
+class PoolStats:
+    """Cuántas veces se pidió una conexión y cuánto se esperó en total."""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        # WeakSet: un pool que ya nadie usa no sigue sumando en los gauges
+        self.pools = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def record(self, elapsed):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += elapsed
+
+    def metrics(self):
+        # Saturación = db_pool_checked_out / (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+        queue_pools = [pool for pool in list(self.pools) if isinstance(pool, QueuePool)]
+        return [
+            ('db_pool_checkouts_total', 'counter', 'Conexiones pedidas al pool', self.checkouts),
+            ('db_pool_checkout_wait_seconds_total', 'counter', 'Tiempo esperando una conexión', self.wait_seconds),
+            ('db_pool_checked_out', 'gauge', 'Conexiones en uso', sum(pool.checkedout() for pool in queue_pools)),
+            ('db_pool_overflow', 'gauge', 'Conexiones abiertas por encima de pool_size', sum(max(pool.overflow(), 0) for pool in queue_pools)),
+        ]
+
+
+pool_stats = PoolStats()
+
+
+class _TimedCheckout:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        pool_stats.pools.add(self)
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            pool_stats.record(time.perf_counter() - start)
+
+    def recreate(self):
+        # engine.dispose(close=False) reemplaza el pool sin llamar a dispose() del viejo
+        pool_stats.pools.discard(self)
+        return super().recreate()
+
+    def dispose(self):
+        super().dispose()
+        pool_stats.pools.discard(self)
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedNullPool(_TimedCheckout, NullPool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def dispose_engines_after_fork(app, db):
+    """Descarta en el proceso hijo las conexiones heredadas del padre (gunicorn --preload).
+    close=False: no se cierran los sockets que el padre sigue usando, solo se dejan de usar."""
+    def after_fork():
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=after_fork)
+
+
+def engine_options(database_uri, is_async=False):
+    """SQLALCHEMY_ENGINE_OPTIONS para `database_uri` según las variables DB_*.
+    Con `is_async` las opciones sirven para create_async_engine (asgi.py)."""
+    url = make_url(database_uri)
+    backend = url.get_backend_name()
+    options = {'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', '1')}
+    connect_args = {}
+
+    if backend == 'sqlite' and url.database in (None, '', ':memory:'):
+        # SQLite en memoria usa un pool especial de una conexión por thread
+        return options
+
+    if _env_bool('DB_PGBOUNCER', '0'):
+        # PgBouncer ya hace de pool: cada checkout abre y cierra contra él
+        options['poolclass'] = InstrumentedNullPool
+        if url.get_driver_name() == 'asyncpg':
+            connect_args['prepared_statement_cache_size'] = 0
+            connect_args['statement_cache_size'] = 0
+    else:
+        options['poolclass'] = InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool
+        options['pool_size'] = _env_int('DB_POOL_SIZE', 5)
+        options['max_overflow'] = _env_int('DB_MAX_OVERFLOW', 10)
+        options['pool_timeout'] = _env_int('DB_POOL_TIMEOUT', 30)
+        recycle = _env_int('DB_POOL_RECYCLE', 1800)
+        if recycle > 0:
+            options['pool_recycle'] = recycle
+
+    timeout_ms = _env_int('DB_STATEMENT_TIMEOUT_MS', 0)
+    # PgBouncer rechaza parámetros de arranque: en ese modo el timeout se configura en el rol de la base
+    if timeout_ms > 0 and not _env_bool('DB_PGBOUNCER', '0'):
+        if backend == 'postgresql' and url.get_driver_name() == 'asyncpg':
+            connect_args['server_settings'] = {'statement_timeout': str(timeout_ms)}
+        elif backend == 'postgresql':
+            connect_args['options'] = '-c statement_timeout=%d' % timeout_ms
+        elif backend in ('mysql', 'mariadb'):
+            connect_args['init_command'] = 'SET SESSION max_execution_time=%d' % timeout_ms
+    if connect_args:
+        options['connect_args'] = connect_args
+    return options
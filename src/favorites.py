@@ -0,0 +1,339 @@
+from sqlalchemy import and_, delete, func, insert, or_, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload
+from models import db, User, Likes, LikeCount
+from utils import APIException
+
+MAX_BATCH_SIZE = 1000
+
+# Código de error de MySQL/MariaDB para una clave única duplicada
+MYSQL_DUPLICATE_KEY = 1062
+
+# Columna de Likes -> modelo al que apunta la foreign key
+TARGETS = {
+    'user_id': User,
+}
+
+# Tipo de favorito en la API ("people", "planets", ...) -> columna de Likes
+LIKE_TYPES = {}
+
+# ?expand= de /user/<id>/likes -> relación de Likes que se embebe en la respuesta
+EXPANDABLE = {}
+
+# Columna de Likes -> tipo en la API, que es el `kind` de like_count
+LIKE_KINDS = {}
+
+def register_like_type(name, column, model, relationship):
+    """Habilita un modelo como favorito: lo llama el registro de recursos."""
+    TARGETS[column] = model
+    LIKE_TYPES[name] = column
+    EXPANDABLE[name] = relationship
+    LIKE_KINDS[column] = name
+
+def insert_ignore(dialect=None):
+    """INSERT ... ON CONFLICT DO NOTHING sobre la tabla likes. En MySQL es ON DUPLICATE KEY
+    UPDATE id = id: INSERT IGNORE convertiría también las foreign keys rotas en warnings."""
+    if dialect is None:
+        dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(Likes).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(Likes).on_conflict_do_nothing()
+    if dialect in ('mysql', 'mariadb'):
+        return mysql.insert(Likes).on_duplicate_key_update(id=Likes.id)
+    return insert(Likes)
+
+def insert_like(dialect=None):
+    """INSERT de un solo favorito cuyo rowcount es 0 si ya estaba. En MySQL los dialectos de
+    SQLAlchemy usan CLIENT_FOUND_ROWS, con el que ON DUPLICATE KEY UPDATE cuenta 1 también
+    para la fila existente: ahí va un INSERT simple y el duplicado llega como IntegrityError
+    (ver is_duplicate)."""
+    if dialect is None:
+        dialect = db.session.get_bind().dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        return insert(Likes)
+    return insert_ignore(dialect)
+
+def is_duplicate(error):
+    args = getattr(error.orig, 'args', ())
+    return bool(args) and args[0] == MYSQL_DUPLICATE_KEY
+
+def count_upsert(dialect=None):
+    """INSERT ... ON CONFLICT DO UPDATE que suma `count` al contador de like_count.
+    Se ejecuta con las filas de count_rows(), en la misma transacción que el cambio en likes."""
+    if dialect is None:
+        dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        statement = postgresql.insert(LikeCount)
+        return statement.on_conflict_do_update(index_elements=['kind', 'target_id'],
+                                               set_={'count': LikeCount.count + statement.excluded['count']})
+    if dialect == 'sqlite':
+        statement = sqlite.insert(LikeCount)
+        return statement.on_conflict_do_update(index_elements=['kind', 'target_id'],
+                                               set_={'count': LikeCount.count + statement.excluded['count']})
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(LikeCount)
+        return statement.on_duplicate_key_update(count=LikeCount.count + statement.inserted['count'])
+    raise RuntimeError("like_count no soporta %s" % dialect)
+
+def count_rows(deltas):
+    """{(columna, id): delta} -> parámetros de count_upsert(), ordenados por (kind, target_id):
+    dos lotes concurrentes bloquean las filas de like_count en el mismo orden y no se traban."""
+    rows = [{'kind': LIKE_KINDS[column], 'target_id': target_id, 'count': delta}
+            for (column, target_id), delta in deltas.items() if delta]
+    return sorted(rows, key=lambda row: (row['kind'], row['target_id']))
+
+def _update_counts(deltas):
+    rows = count_rows(deltas)
+    if rows:
+        db.session.execute(count_upsert(), rows)
+
+def violated_column(error, values):
+    # PostgreSQL dice qué constraint falló (likes_user_id_fkey); otros motores a veces lo ponen en el mensaje
+    diag = getattr(error.orig, 'diag', None)
+    text = getattr(diag, 'constraint_name', None) or str(error.orig)
+    for column in values:
+        if column in text:
+            return column
+    return None
+
+def add_like(user_id, column, target_id):
+    """Agrega un favorito en un solo round trip.
+
+    Devuelve None si se agregó, 'exists' si ya estaba, o el nombre de la columna
+    ('user_id', 'planets_id', ...) cuya foreign key no existe.
+    """
+    values = {'user_id': user_id, column: target_id}
+    try:
+        result = db.session.execute(insert_like().values(**values))
+        if result.rowcount:
+            _update_counts({(column, target_id): 1})
+        db.session.commit()
+    except IntegrityError as error:
+        db.session.rollback()
+        if is_duplicate(error):
+            return 'exists'
+        missing = violated_column(error, values)
+        if missing is None:
+            # SQLite no indica qué foreign key falló: solo en este camino de error se consulta
+            missing = column if db.session.get(TARGETS[column], target_id) is None else 'user_id'
+        return missing
+    if result.rowcount == 0:
+        return 'exists'
+    return None
+
+def parse_batch(payload):
+    """Valida el cuerpo de los endpoints :batch, una lista de {"type": ..., "id": ...}."""
+    if not isinstance(payload, list):
+        raise APIException("Se esperaba una lista de {type, id}", status_code=400)
+    if len(payload) > MAX_BATCH_SIZE:
+        raise APIException("Máximo %d favoritos por request" % MAX_BATCH_SIZE, status_code=400)
+    items = []
+    for entry in payload:
+        if not isinstance(entry, dict):
+            raise APIException("Se esperaba una lista de {type, id}", status_code=400)
+        like_type, target_id = entry.get('type'), entry.get('id')
+        if like_type not in LIKE_TYPES or not isinstance(target_id, int) or isinstance(target_id, bool):
+            items.append((like_type, target_id, None))
+        else:
+            items.append((like_type, target_id, LIKE_TYPES[like_type]))
+    return items
+
+def _ids_by_column(items):
+    grouped = {}
+    for like_type, target_id, column in items:
+        if column is not None:
+            grouped.setdefault(column, set()).add(target_id)
+    return grouped
+
+def _liked(user_id, grouped):
+    # Un solo SELECT con OR de IN (...) por cada tipo: devuelve {(columna, id): like.id}
+    if not grouped:
+        return {}
+    conditions = [getattr(Likes, column).in_(ids) for column, ids in grouped.items()]
+    columns = [getattr(Likes, column) for column in grouped]
+    rows = db.session.execute(
+        select(Likes.id, *columns).where(Likes.user_id == user_id, or_(*conditions))
+    ).all()
+    liked = {}
+    for row in rows:
+        for column, ids in grouped.items():
+            value = getattr(row, column)
+            if value in ids:
+                liked[(column, value)] = row.id
+    return liked
+
+def _existing(grouped):
+    # {columna: ids que existen en la tabla a la que apunta}
+    existing = {}
+    for column, ids in grouped.items():
+        model = TARGETS[column]
+        existing[column] = set(db.session.scalars(select(model.id).where(model.id.in_(ids))))
+    return existing
+
+def _insert_likes(rows, columns):
+    # executemany del INSERT ... ON CONFLICT DO NOTHING: si otro request agregó el mismo
+    # favorito entre la validación y el insert no se rompe el lote entero
+    statement = insert_ignore()
+    # El executemany inserta fila por fila: en orden fijo, como los contadores (ver count_rows)
+    rows = sorted(rows, key=lambda row: sorted(row.items()))
+    if db.session.get_bind().dialect.insert_executemany_returning:
+        # RETURNING trae solo las filas insertadas de verdad: los contadores no cuentan de más
+        inserted = db.session.execute(statement.returning(*[getattr(Likes, column) for column in columns]), rows)
+        added = [dict(zip(columns, row)) for row in inserted]
+    else:
+        db.session.execute(statement, rows)
+        added = rows
+    _update_counts(_deltas(added, 1))
+    db.session.commit()
+
+def add_likes_batch(user_id, items):
+    """Agrega varios favoritos en una sola transacción. Devuelve el estado de cada item.
+
+    Si un destino se borra entre la validación y el insert, la foreign key rompe el lote:
+    se deshace, se vuelven a consultar los destinos y se reintenta una vez sin los que ya
+    no existen, que quedan como 'not_found' (como en add_like)."""
+    grouped = _ids_by_column(items)
+    existing = _existing(grouped)
+    liked = _liked(user_id, grouped)
+
+    results, rows, seen = [], [], set()
+    for like_type, target_id, column in items:
+        if column is None:
+            status = 'invalid'
+        elif target_id not in existing[column]:
+            status = 'not_found'
+        elif (column, target_id) in liked or (column, target_id) in seen:
+            status = 'exists'
+        else:
+            status = 'added'
+            seen.add((column, target_id))
+            rows.append({'user_id': user_id, column: target_id})
+        results.append({'type': like_type, 'id': target_id, 'status': status})
+    if not rows:
+        return results
+    try:
+        _insert_likes(rows, list(grouped))
+    except IntegrityError:
+        db.session.rollback()
+        if db.session.get(User, user_id) is None:
+            gone = {(column, row[column]) for row in rows for column in grouped if column in row}
+        else:
+            existing = _existing(grouped)
+            gone = {(column, row[column]) for row in rows for column in grouped
+                    if column in row and row[column] not in existing[column]}
+        for result in results:
+            if result['status'] == 'added' and (LIKE_TYPES[result['type']], result['id']) in gone:
+                result['status'] = 'not_found'
+        rows = [row for row in rows if not any((column, value) in gone for column, value in row.items())]
+        if rows:
+            _insert_likes(rows, list(grouped))
+    return results
+
+def remove_likes_batch(user_id, items):
+    """Borra varios favoritos con un único DELETE. Devuelve el estado de cada item."""
+    liked = _liked(user_id, _ids_by_column(items))
+    results, to_delete = [], set()
+    for like_type, target_id, column in items:
+        if column is None:
+            status = 'invalid'
+        elif (column, target_id) in liked:
+            status = 'deleted'
+            to_delete.add(liked[(column, target_id)])
+        else:
+            status = 'not_found'
+        results.append({'type': like_type, 'id': target_id, 'status': status})
+    if to_delete:
+        statement = delete(Likes).where(Likes.id.in_(to_delete))
+        columns = list(LIKE_KINDS)
+        if db.session.get_bind().dialect.delete_returning:
+            # Si otro request borró alguno en el medio, RETURNING no lo trae y no se descuenta dos veces
+            deleted = db.session.execute(statement.returning(*[getattr(Likes, column) for column in columns]))
+            removed = [dict(zip(columns, row)) for row in deleted]
+        else:
+            db.session.execute(statement)
+            removed = [{column: target_id} for (column, target_id), like_id in liked.items() if like_id in to_delete]
+        _update_counts(_deltas(removed, -1))
+        db.session.commit()
+    return results
+
+def _deltas(rows, sign):
+    # Filas de likes ({columna: id, ...}) -> {(columna, id): delta}
+    deltas = {}
+    for row in rows:
+        for column, target_id in row.items():
+            if column in LIKE_KINDS and target_id is not None:
+                deltas[(column, target_id)] = deltas.get((column, target_id), 0) + sign
+    return deltas
+
+def parse_expand(raw):
+    if not raw:
+        return []
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    unknown = [name for name in names if name not in EXPANDABLE]
+    if unknown:
+        raise APIException("expand no soportado: %s" % ", ".join(unknown), status_code=400)
+    return [EXPANDABLE[name] for name in names]
+
+def user_likes_query(user_id, expand=()):
+    # selectinload hace una consulta extra por relación, no una por favorito
+    query = select(Likes).where(Likes.user_id == user_id).order_by(Likes.id)
+    for relationship in expand:
+        query = query.options(selectinload(getattr(Likes, relationship)))
+    return query
+
+def serialize_like(like, expand=()):
+    item = like.serialize()
+    for relationship in expand:
+        related = getattr(like, relationship)
+        item[relationship] = related.serialize() if related is not None else None
+    return item
+
+def user_likes(user_id, expand=()):
+    """Favoritos del usuario con las relaciones de `expand` ya cargadas."""
+    return [serialize_like(like, expand) for like in db.session.scalars(user_likes_query(user_id, expand))]
+
+def delete_like(user_id, column, target_id):
+    return delete(Likes).where(Likes.user_id == user_id, getattr(Likes, column) == target_id)
+
+def remove_like(user_id, column, target_id):
+    """Borra un favorito con un único DELETE. Devuelve False si no existía."""
+    result = db.session.execute(delete_like(user_id, column, target_id))
+    if result.rowcount:
+        _update_counts({(column, target_id): -1})
+    db.session.commit()
+    return result.rowcount > 0
+
+def popular(query, column, limit):
+    """Las `limit` entidades con más favoritos, de mayor a menor: [(entidad, cantidad)].
+    `query` es la consulta base del modelo al que apunta `column`."""
+    model, kind = TARGETS[column], LIKE_KINDS[column]
+    return (query.add_columns(LikeCount.count)
+            .join(LikeCount, and_(LikeCount.kind == kind, LikeCount.target_id == model.id))
+            .filter(LikeCount.count > 0)
+            .order_by(LikeCount.count.desc(), LikeCount.target_id.desc())
+            .limit(limit)
+            .all())
+
+def reconcile_like_counts():
+    """Recalcula like_count a partir de likes con un GROUP BY por tipo. Sirve de backfill y
+    para corregir desvíos; conviene correrlo con poco tráfico. Devuelve cuántas filas cambió."""
+    changed = 0
+    for column, kind in LIKE_KINDS.items():
+        target = getattr(Likes, column)
+        actual = dict(db.session.execute(
+            select(target, func.count()).where(target.isnot(None)).group_by(target)
+        ).all())
+        stored = dict(db.session.execute(
+            select(LikeCount.target_id, LikeCount.count).where(LikeCount.kind == kind)
+        ).all())
+        stale = [target_id for target_id in stored if target_id not in actual]
+        if stale:
+            db.session.execute(delete(LikeCount).where(LikeCount.kind == kind, LikeCount.target_id.in_(stale)))
+        # La diferencia se suma con el mismo upsert que usan los favoritos
+        deltas = {(column, target_id): count - stored.get(target_id, 0) for target_id, count in actual.items()}
+        _update_counts(deltas)
+        changed += len(stale) + len(count_rows(deltas))
+    db.session.commit()
+    return changed
@@ -0,0 +1,68 @@
+from flask import request
+from models import db
+from utils import APIException
+
+def int_arg(name, args=None):
+    raw = (request.args if args is None else args).get(name)
+    if raw is None or raw == '':
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise APIException("%s debe ser un número entero" % name, status_code=400)
+
+def _like_escape(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def prefix_upper_bound(value):
+    """Menor string mayor que todos los que empiezan con `value`: el prefijo con su último
+    code point incrementado (saltando los surrogates, que no se pueden codificar). None si
+    no hay cota, por ejemplo si `value` termina en U+10FFFF."""
+    while value:
+        last = ord(value[-1]) + 1
+        if 0xD800 <= last <= 0xDFFF:
+            last = 0xE000
+        if last <= 0x10FFFF:
+            return value[:-1] + chr(last)
+        value = value[:-1]
+    return None
+
+def apply_filters(query, filters, args=None, dialect=None):
+    """Aplica los filtros del query string presentes en el request.
+
+    `filters` es una lista de (parámetro, columna, operador) con operador 'eq', 'min', 'max',
+    'prefix' o 'contains'. Cada filtro tiene que estar respaldado por un índice sobre su columna
+    ('contains' por un índice trigram, que solo existe en PostgreSQL). Sirve tanto para
+    Query como para select(); `args` por defecto es request.args y `dialect` el de la sesión.
+    """
+    if args is None:
+        args = request.args
+    if dialect is None:
+        dialect = db.session.get_bind().dialect.name
+    for name, column, op in filters:
+        if op in ('min', 'max') or (op == 'eq' and column.type.python_type is int):
+            value = int_arg(name, args)
+        else:
+            value = args.get(name) or None
+        if value is None:
+            continue
+        if op == 'eq':
+            query = query.filter(column == value)
+        elif op == 'min':
+            query = query.filter(column >= value)
+        elif op == 'max':
+            query = query.filter(column <= value)
+        elif op == 'prefix':
+            # El LIKE deja el resultado exacto. En PostgreSQL usa solo el índice text_pattern_ops
+            # (un rango no coincide con el LIKE bajo collations que no son C); en los demás
+            # motores el rango hace que sirva el índice B-tree (LIKE 'x%' no lo usa en SQLite)
+            like = column.like(_like_escape(value) + '%', escape='\\')
+            if dialect == 'postgresql':
+                query = query.filter(like)
+            else:
+                upper = prefix_upper_bound(value)
+                bounds = [column >= value] + ([column < upper] if upper is not None else [])
+                query = query.filter(*bounds, like)
+        elif op == 'contains':
+            query = query.filter(column.ilike('%' + _like_escape(value) + '%', escape='\\'))
+    return query
@@ -0,0 +1,152 @@
+"""
+Instrumentación opcional por request (INSTRUMENTATION=1): cantidad de sentencias SQL,
+tiempo en la base, tiempo de codificación JSON y latencia total por endpoint.
+
+- Cada respuesta lleva un header Server-Timing con esos valores. En las respuestas en
+  streaming (NDJSON) las consultas corren después de mandar los headers: el header solo dice
+  desc="streamed" y los totales de /metrics se suman cuando termina el cuerpo.
+- GET /metrics expone los acumulados en formato Prometheus (por proceso/worker).
+- Las consultas más lentas que SLOW_QUERY_MS se loguean con sus parámetros y la ruta.
+"""
+import os
+import threading
+import time
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+METRICS = (
+    ('requests', 'Requests atendidos'),
+    ('db_statements', 'Sentencias SQL ejecutadas'),
+    ('db_seconds', 'Tiempo en la base de datos'),
+    ('serialize_seconds', 'Tiempo codificando JSON'),
+    ('request_seconds', 'Latencia total del request'),
+)
+
+
+class Instrumentation:
+    def __init__(self, app=None):
+        self.app = None
+        self.slow_query_seconds = 0.2
+        self._totals = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('INSTRUMENTATION', os.getenv('INSTRUMENTATION', '0') in ('1', 'true'))
+        app.config.setdefault('SLOW_QUERY_MS', int(os.getenv('SLOW_QUERY_MS', 200)))
+        if not app.config['INSTRUMENTATION']:
+            return
+        self.app = app
+        self.slow_query_seconds = app.config['SLOW_QUERY_MS'] / 1000.0
+
+        if not event.contains(Engine, 'before_cursor_execute', self._before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        self._time_json(app)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view, methods=['GET'])
+        app.extensions['instrumentation'] = self
+
+    def add_collector(self, collector):
+        """Suma métricas propias a /metrics: `collector()` devuelve [(nombre, tipo, ayuda, valor)].
+        Registrar dos veces el mismo collector (otra app con create_app()) no repite sus métricas."""
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def _time_json(self, app):
+        # Se envuelve el proveedor JSON de la app (jsonify pasa siempre por acá)
+        encode = app.json.response
+
+        def timed_response(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return encode(*args, **kwargs)
+            finally:
+                stats = g.get('instrumentation')
+                if stats is not None:
+                    stats['serialize_seconds'] += time.perf_counter() - start
+
+        app.json.response = timed_response
+
+    # ---- SQLAlchemy -----------------------------------------------------------------
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('instrumentation_start', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['instrumentation_start'].pop()
+        if not has_request_context():
+            return
+        stats = g.get('instrumentation')
+        if stats is not None:
+            stats['db_statements'] += 1
+            stats['db_seconds'] += elapsed
+        if elapsed >= self.slow_query_seconds:
+            self.app.logger.warning(
+                "Consulta lenta (%.1f ms) en %s %s: %s -- parámetros: %r",
+                elapsed * 1000, request.method, request.path, ' '.join(statement.split()), parameters,
+            )
+
+    # ---- Flask ----------------------------------------------------------------------
+
+    def _before_request(self):
+        g.instrumentation = {
+            'start': time.perf_counter(),
+            'db_statements': 0,
+            'db_seconds': 0.0,
+            'serialize_seconds': 0.0,
+        }
+
+    def _after_request(self, response):
+        stats = g.get('instrumentation')
+        if stats is None:
+            return response
+        endpoint = request.endpoint or 'unknown'
+        if response.is_streamed:
+            # g.instrumentation queda para las consultas del generador (stream_with_context)
+            response.headers['Server-Timing'] = 'db;desc="streamed"'
+            response.call_on_close(lambda: self._record(endpoint, stats, time.perf_counter() - stats['start']))
+            return response
+        g.pop('instrumentation')
+        total = time.perf_counter() - stats['start']
+        response.headers['Server-Timing'] = ', '.join([
+            'db;dur=%.2f;desc="%d queries"' % (stats['db_seconds'] * 1000, stats['db_statements']),
+            'serialize;dur=%.2f' % (stats['serialize_seconds'] * 1000),
+            'total;dur=%.2f' % (total * 1000),
+        ])
+        self._record(endpoint, stats, total)
+        return response
+
+    def _record(self, endpoint, stats, total):
+        with self._lock:
+            totals = self._totals.setdefault(endpoint, dict.fromkeys((name for name, _ in METRICS), 0))
+            totals['requests'] += 1
+            totals['db_statements'] += stats['db_statements']
+            totals['db_seconds'] += stats['db_seconds']
+            totals['serialize_seconds'] += stats['serialize_seconds']
+            totals['request_seconds'] += total
+
+    def metrics_view(self):
+        lines = []
+        with self._lock:
+            snapshot = {endpoint: dict(values) for endpoint, values in self._totals.items()}
+        for name, description in METRICS:
+            metric = 'swapi_%s_total' % name
+            lines.append('# HELP %s %s' % (metric, description))
+            lines.append('# TYPE %s counter' % metric)
+            for endpoint, values in sorted(snapshot.items()):
+                lines.append('%s{endpoint="%s"} %s' % (metric, endpoint, values[name]))
+        for collector in self._collectors:
+            for name, kind, description, value in collector():
+                metric = 'swapi_%s' % name
+                lines.append('# HELP %s %s' % (metric, description))
+                lines.append('# TYPE %s %s' % (metric, kind))
+                lines.append('%s %s' % (metric, value))
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+
+instrumentation = Instrumentation()
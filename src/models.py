@@ -1,6 +1,19 @@
+import sqlite3
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+# RoutingSession manda las lecturas de los GET a las réplicas si hay DATABASE_REPLICA_URLS
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# SQLite no valida foreign keys salvo que se lo pida en cada conexión
+@event.listens_for(Engine, "connect")
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
 
 class User(db.Model):
     # Here we define columns for the table person
@@ -27,7 +40,7 @@ class People(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(250), unique=True, nullable=False)
     birth_year = db.Column(db.Integer)
-    homeworld = db.Column(db.String(250), unique=False)
+    homeworld = db.Column(db.String(250), unique=False, index=True)
     starship = db.Column(db.String(250), unique=False)
 
     def __repr__(self):
@@ -50,7 +63,11 @@ class Vehicle(db.Model):
     name = db.Column(db.String(250))
     model = db.Column(db.String(250))
     vehicle_class = db.Column(db.String(250), nullable=False)
-    passengers = db.Column(db.Integer)
+    passengers = db.Column(db.Integer, index=True)
+    # Filtro por clase y rango de pasajeros en /vehicles
+    __table_args__ = (
+        db.Index('ix_vehicle_vehicle_class_passengers', 'vehicle_class', 'passengers'),
+    )
 
     def __repr__(self):
         return '<Vehicle %r>' % self.id
@@ -69,10 +86,10 @@ class Planets(db.Model):
     # Here we define columns for the table address.
     # Notice that each column is also a normal Python instance attribute.
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(250))
-    population = db.Column(db.Integer)
+    name = db.Column(db.String(250), index=True)
+    population = db.Column(db.Integer, index=True)
     gravity = db.Column(db.String(250))
-    climate = db.Column(db.Integer)
+    climate = db.Column(db.Integer, index=True)
 
     def __repr__(self):
         return '<Planets %r>' % self.id
@@ -90,14 +107,22 @@ class Planets(db.Model):
 class Likes(db.Model):
     # Here we define columns for the table person
     # Notice that each column is also a normal Python instance attribute.
+    # Un usuario no puede marcar dos veces el mismo favorito (los NULL no chocan entre sí)
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'people_id', name='uq_likes_user_people'),
+        db.UniqueConstraint('user_id', 'planets_id', name='uq_likes_user_planets'),
+        db.UniqueConstraint('user_id', 'vehicle_id', name='uq_likes_user_vehicle'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
     user = db.relationship(User)
-    people_id = db.Column(db.Integer, db.ForeignKey('people.id'))
+    # user_id ya queda indexado como primera columna de las constraints únicas;
+    # los índices simples sirven para buscar likes por entidad (ej. al borrar un People)
+    people_id = db.Column(db.Integer, db.ForeignKey('people.id'), index=True)
     people = db.relationship(People)
-    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'))
+    vehicle_id = db.Column(db.Integer, db.ForeignKey('vehicle.id'), index=True)
     vehicle = db.relationship(Vehicle) 
-    planets_id = db.Column(db.Integer, db.ForeignKey('planets.id'))
+    planets_id = db.Column(db.Integer, db.ForeignKey('planets.id'), index=True)
     planets = db.relationship(Planets)
     
 
@@ -111,4 +136,27 @@ class Likes(db.Model):
             "people_id": self.people_id,
             "vehicle_id": self.vehicle_id,
             "planets_id": self.planets_id,
-        }
\ No newline at end of file
+        }
+
+class LikeCount(db.Model):
+    # Cantidad de favoritos por entidad, mantenida en la misma transacción que cada alta o baja
+    # de Likes (ver favorites.py). Tabla aparte para no invalidar el cache de /people, /planets...
+    # con cada favorito. `kind` es el tipo de la API: "people", "planets", "vehicles".
+    __tablename__ = 'like_count'
+    __table_args__ = (
+        # Top-N de /<kind>/popular: recorre el índice de atrás para adelante, sin ordenar
+        db.Index('ix_like_count_kind_count', 'kind', 'count', 'target_id'),
+    )
+    kind = db.Column(db.String(50), primary_key=True)
+    target_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    def __repr__(self):
+        return '<LikeCount %s %r>' % (self.kind, self.target_id)
+
+    def serialize(self):
+        return {
+            "kind": self.kind,
+            "target_id": self.target_id,
+            "count": self.count,
+        }
@@ -0,0 +1,201 @@
+"""
+Spec OpenAPI 3 de la API, generada desde las rutas de la app y el registro de recursos
+(resources.py): cada ruta sale del url_map, y las de los recursos se completan con sus
+filtros, ?fields=, paginación, streaming y el esquema de sus campos públicos.
+
+No depende de docstrings YAML: un recurso nuevo aparece en la spec con solo registrarse.
+La app la arma una sola vez y la sirve desde memoria (ver utils.static_document).
+"""
+import inspect
+import re
+from favorites import EXPANDABLE, LIKE_TYPES, MAX_BATCH_SIZE
+from models import Likes
+from pagination import MAX_PAGE_SIZE
+from resources import resources, POPULAR_SIZE
+from serializers import public_fields
+
+IGNORED_METHODS = {'HEAD', 'OPTIONS'}
+# Rutas que no se documentan: los archivos estáticos y /swagger.json (redirige a /openapi.json)
+IGNORED_ENDPOINTS = {'static', 'swagger_redirect'}
+BATCH_STATUSES = ['added', 'exists', 'deleted', 'not_found', 'invalid']
+CONVERTER_TYPES = {'int': 'integer', 'float': 'number'}
+PYTHON_TYPES = {int: 'integer', float: 'number', bool: 'boolean', str: 'string'}
+# Tipo del parámetro según el operador del filtro; 'eq' usa el de la columna
+OPERATOR_TYPES = {'prefix': 'string', 'contains': 'string'}
+
+PATH_ARGUMENT = re.compile(r'<(?:(\w+)(?:\([^)]*\))?:)?(\w+)>')
+
+ERROR = {'$ref': '#/components/schemas/Message'}
+
+
+def openapi_path(rule):
+    """/people/<int:item_id> -> /people/{item_id}"""
+    return PATH_ARGUMENT.sub(r'{\2}', rule)
+
+
+def path_parameters(rule):
+    return [{
+        'name': name,
+        'in': 'path',
+        'required': True,
+        'schema': {'type': CONVERTER_TYPES.get(converter, 'string')},
+    } for converter, name in PATH_ARGUMENT.findall(rule)]
+
+
+def query_parameter(name, schema_type, description):
+    return {'name': name, 'in': 'query', 'required': False, 'schema': {'type': schema_type},
+            'description': description}
+
+
+def column_type(column):
+    try:
+        return PYTHON_TYPES.get(column.type.python_type, 'string')
+    except NotImplementedError:
+        return 'string'
+
+
+def json_content(schema):
+    return {'application/json': {'schema': schema}}
+
+
+def response(description, schema=None):
+    if schema is None:
+        return {'description': description}
+    return {'description': description, 'content': json_content(schema)}
+
+
+def resource_schema(resource):
+    columns = resource.model.__table__.columns
+    properties = {name: {'type': column_type(columns[name]) if name in columns else 'string'}
+                  for name in resource.fields}
+    return {'type': 'object', 'properties': properties}
+
+
+def list_parameters(resource):
+    parameters = []
+    for name, column, operator in resource.filters:
+        schema_type = OPERATOR_TYPES.get(operator) or column_type(column)
+        parameters.append(query_parameter(name, schema_type, "filtro %s sobre %s" % (operator, column.key)))
+    parameters += [
+        query_parameter('fields', 'string', "subconjunto de campos separados por coma: %s" % ",".join(resource.column_fields)),
+        query_parameter('limit', 'integer', "tamaño de página (máximo %d); con limit o after la respuesta es una página" % MAX_PAGE_SIZE),
+        query_parameter('after', 'string', "cursor opaco del campo next de la página anterior"),
+        query_parameter('stream', 'string', "1 para recibir NDJSON en streaming (o Accept: application/x-ndjson)"),
+    ]
+    return parameters
+
+
+def describe_resource(paths, resource):
+    """Completa las operaciones que generó resource.register()."""
+    item = {'$ref': '#/components/schemas/%s' % resource.model.__name__}
+    if 'list' in resource.routes:
+        operation = paths['/%s' % resource.path]['get']
+        operation['summary'] = "Listado de %s" % resource.path
+        operation['parameters'] = list_parameters(resource)
+        page = {'type': 'object', 'properties': {
+            'results': {'type': 'array', 'items': item},
+            'next': {'type': 'string', 'nullable': True},
+        }}
+        operation['responses'] = {
+            '200': response("lista completa, o una página con ?limit/?after", {'oneOf': [{'type': 'array', 'items': item}, page]}),
+            '304': response("sin cambios desde el ETag enviado"),
+            '400': response("filtro, campo o cursor inválido", ERROR),
+        }
+    if 'detail' in resource.routes:
+        operation = paths['/%s/{item_id}' % resource.path]['get']
+        operation['summary'] = "Detalle de un %s" % resource.label
+        operation['responses'] = {
+            '200': response("OK", item),
+            '304': response("sin cambios desde el ETag enviado"),
+            '404': response("%s no existente" % resource.label, ERROR),
+        }
+    if 'likes' in resource.routes:
+        operation = paths['/%s/popular' % resource.path]['get']
+        operation['summary'] = "Los %s con más favoritos" % resource.path
+        operation['parameters'] = [query_parameter('limit', 'integer', "cantidad (por defecto %d)" % POPULAR_SIZE)]
+        popular = {'allOf': [item, {'type': 'object', 'properties': {'likes': {'type': 'integer'}}}]}
+        operation['responses'] = {'200': response("OK", {'type': 'array', 'items': popular})}
+        likes = paths['/likes/%s/{user_id}/{item_id}' % resource.path]
+        likes['post']['summary'] = "Agrega el %s a los favoritos del usuario" % resource.label
+        likes['delete']['summary'] = "Borra el %s de los favoritos del usuario" % resource.label
+        for operation in (likes['post'], likes['delete']):
+            operation['responses'] = {'200': response("OK", ERROR), '404': response("no existe", ERROR)}
+
+
+def describe_user_likes(paths):
+    """?expand= de /user/{user_id}/likes y el cuerpo de los endpoints :batch."""
+    columns = Likes.__table__.columns
+    like = {'type': 'object', 'properties': {name: {'type': column_type(columns[name])} for name in public_fields(Likes)}}
+    for resource in resources.resources.values():
+        if resource.relationship in EXPANDABLE.values():
+            like['properties'][resource.relationship] = {
+                'allOf': [{'$ref': '#/components/schemas/%s' % resource.model.__name__}],
+                'nullable': True,
+                'description': "solo con ?expand=%s" % resource.path,
+            }
+    operation = paths['/user/{user_id}/likes']['get']
+    operation['summary'] = "Favoritos del usuario"
+    operation['parameters'].append(query_parameter(
+        'expand', 'string', "objetos a embeber, separados por coma: %s" % ",".join(EXPANDABLE)))
+    operation['responses'] = {
+        '200': response("OK", {'type': 'array', 'items': {'$ref': '#/components/schemas/Like'}}),
+        '304': response("sin cambios desde el ETag enviado"),
+        '400': response("expand no soportado", ERROR),
+    }
+
+    batch = paths['/user/{user_id}/likes:batch']
+    body = {'type': 'array', 'maxItems': MAX_BATCH_SIZE, 'items': {'type': 'object', 'required': ['type', 'id'], 'properties': {
+        'type': {'type': 'string', 'enum': list(LIKE_TYPES)},
+        'id': {'type': 'integer'},
+    }}}
+    results = {'type': 'object', 'properties': {'results': {'type': 'array', 'items': {'type': 'object', 'properties': {
+        'type': {'type': 'string'},
+        'id': {'type': 'integer'},
+        'status': {'type': 'string', 'enum': BATCH_STATUSES},
+    }}}}}
+    batch['post']['summary'] = "Agrega varios favoritos en una transacción"
+    batch['delete']['summary'] = "Borra varios favoritos con un solo DELETE"
+    for operation in batch.values():
+        operation['requestBody'] = {'required': True, 'content': json_content(body)}
+        operation['responses'] = {
+            '200': response("estado de cada item", results),
+            '400': response("cuerpo inválido", ERROR),
+        }
+    batch['post']['responses']['404'] = response("el usuario no existe", ERROR)
+    return like
+
+
+def build_spec(app, title='API', version='1.0'):
+    """Spec OpenAPI 3 de `app` como dict."""
+    paths = {}
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint in IGNORED_ENDPOINTS or rule.endpoint.startswith('admin') or '.' in rule.endpoint:
+            continue
+        operations = paths.setdefault(openapi_path(rule.rule), {})
+        doc = inspect.getdoc(app.view_functions[rule.endpoint])
+        for method in sorted(rule.methods - IGNORED_METHODS):
+            operation = {
+                'operationId': rule.endpoint if len(rule.methods - IGNORED_METHODS) == 1
+                else '%s_%s' % (rule.endpoint, method.lower()),
+                'responses': {'200': response("OK")},
+            }
+            if doc:
+                operation['summary'] = doc.splitlines()[0]
+            parameters = path_parameters(rule.rule)
+            if parameters:
+                operation['parameters'] = parameters
+            operations[method.lower()] = operation
+
+    schemas = {'Message': {'type': 'object', 'properties': {'msg': {'type': 'string'}, 'message': {'type': 'string'}}}}
+    for resource in resources.resources.values():
+        schemas[resource.model.__name__] = resource_schema(resource)
+        describe_resource(paths, resource)
+    if '/user/{user_id}/likes' in paths:
+        schemas['Like'] = describe_user_likes(paths)
+
+    return {
+        'openapi': '3.0.3',
+        'info': {'title': title, 'version': version},
+        'paths': dict(sorted(paths.items())),
+        'components': {'schemas': schemas},
+    }
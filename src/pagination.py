@@ -0,0 +1,70 @@
+import base64
+import binascii
+from flask import request
+from utils import APIException
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(last_id):
+    # El cursor es opaco para el cliente: solo es el último id visto en base64
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    padding = "=" * (-len(cursor) % 4)
+    try:
+        return int(base64.urlsafe_b64decode(cursor + padding).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        raise APIException("Cursor inválido", status_code=400)
+
+def page_args(args=None):
+    """Lee ?limit=&after= del request. Devuelve (None, None) si no se pidió paginación."""
+    if args is None:
+        args = request.args
+    raw_limit = args.get('limit')
+    raw_after = args.get('after')
+    if raw_limit is None and raw_after is None:
+        return None, None
+    limit = DEFAULT_PAGE_SIZE
+    if raw_limit is not None:
+        try:
+            limit = int(raw_limit)
+        except ValueError:
+            raise APIException("limit debe ser un número entero", status_code=400)
+        if limit < 1:
+            raise APIException("limit debe ser mayor a 0", status_code=400)
+        limit = min(limit, MAX_PAGE_SIZE)
+    after = decode_cursor(raw_after) if raw_after else None
+    return limit, after
+
+def keyset_query(query, model, limit, after=None):
+    # Keyset pagination: WHERE id > after ORDER BY id LIMIT n+1, siempre por el índice de la primary key
+    if after is not None:
+        query = query.filter(model.id > after)
+    return query.order_by(model.id).limit(limit + 1)
+
+def split_page(rows, limit):
+    """Recorta la fila de más que trae keyset_query y arma el cursor de la página siguiente."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
+
+def keyset_page(query, model, limit, after=None):
+    return split_page(keyset_query(query, model, limit, after).all(), limit)
+
+def paginate(model, query=None, serialize=None):
+    """Devuelve la página pedida como dict, o None si el request no usa ?limit/?after."""
+    limit, after = page_args()
+    if limit is None:
+        return None
+    if query is None:
+        query = model.query
+    if serialize is None:
+        serialize = model.serialize
+    rows, next_cursor = keyset_page(query, model, limit, after)
+    return {
+        "results": [serialize(item) for item in rows],
+        "next": next_cursor,
+    }
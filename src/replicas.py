@@ -0,0 +1,114 @@
+"""
+Ruteo de lecturas a réplicas (opcional).
+
+    DATABASE_REPLICA_URLS=postgresql://replica1/db,postgresql://replica2/db
+    DB_REPLICA_STICKY_SECONDS=5
+
+Sin DATABASE_REPLICA_URLS todo va a la primaria como siempre. Con réplicas:
+
+- Los GET/HEAD leen de una réplica, elegida round-robin por sesión (un request usa siempre la misma).
+- Los INSERT/UPDATE/DELETE, los flush y todo lo que se lea después en ese mismo request van a la primaria.
+- Después de un request que escribió se manda la cookie `db_primary`: durante
+  DB_REPLICA_STICKY_SECONDS los GET de ese cliente leen de la primaria (read-after-write)
+  mientras las réplicas se ponen al día.
+- Fuera de un request (CLI, migraciones, scripts) se usa la primaria.
+
+Las versiones del cache de respuestas se invalidan al commitear en la primaria, pero una réplica
+atrasada todavía puede devolver los datos de antes. Por eso, durante DB_REPLICA_STICKY_SECONDS
+después de que cambia una tabla, los GET que leen de una réplica no se guardan en el cache ni
+llevan el ETag de la versión nueva (ver cache.ResponseCache.settling): el ETag es el del cuerpo.
+Un atraso de la réplica mayor que ese plazo puede quedar cacheado hasta el próximo cambio de la
+tabla (o CACHE_TTL con el cache en memoria).
+"""
+import itertools
+import os
+import threading
+import time
+from flask import has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+from database import engine_options
+
+PIN_COOKIE = 'db_primary'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def replica_urls(raw=None):
+    """Lista de URLs de DATABASE_REPLICA_URLS (separadas por coma)."""
+    if raw is None:
+        raw = os.getenv('DATABASE_REPLICA_URLS', '')
+    return [url.strip().replace("postgres://", "postgresql://") for url in raw.split(',') if url.strip()]
+
+
+def pinned(cookie_value, now=None):
+    """True si la cookie de read-after-write todavía no venció."""
+    try:
+        return float(cookie_value) > (time.time() if now is None else now)
+    except (TypeError, ValueError):
+        return False
+
+
+class ReplicaRouter:
+    def __init__(self, app=None):
+        self.keys = []
+        self.sticky_seconds = 5
+        self._cycle = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Registra cada réplica como un bind de Flask-SQLAlchemy. Va antes de db.init_app(app)."""
+        app.config.setdefault('DATABASE_REPLICA_URLS', os.getenv('DATABASE_REPLICA_URLS', ''))
+        app.config.setdefault('DB_REPLICA_STICKY_SECONDS', int(os.getenv('DB_REPLICA_STICKY_SECONDS', 5)))
+        self.sticky_seconds = app.config['DB_REPLICA_STICKY_SECONDS']
+        binds = app.config.setdefault('SQLALCHEMY_BINDS', {})
+        self.keys = []
+        for index, url in enumerate(replica_urls(app.config['DATABASE_REPLICA_URLS'])):
+            key = 'replica_%d' % index
+            # Sin tablas propias: create_all y las migraciones nunca tocan estos binds
+            binds[key] = dict(engine_options(url), url=url)
+            self.keys.append(key)
+        self._cycle = itertools.cycle(self.keys) if self.keys else None
+        if self.keys:
+            app.after_request(self._after_request)
+        app.extensions['replica_router'] = self
+
+    def next_replica(self):
+        with self._lock:
+            return next(self._cycle)
+
+    def pin_cookie_value(self):
+        return '%.3f' % (time.time() + self.sticky_seconds)
+
+    def read_only_request(self):
+        if not self.keys or not has_request_context():
+            return False
+        return request.method in READ_METHODS and not pinned(request.cookies.get(PIN_COOKIE))
+
+    def _after_request(self, response):
+        from models import db
+
+        # registry.has() evita crear una sesión solo para preguntar
+        if db.session.registry.has() and db.session.info.get('wrote'):
+            response.set_cookie(PIN_COOKIE, self.pin_cookie_value(), max_age=self.sticky_seconds,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+replica_router = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """Sesión de db.session: elige réplica o primaria en cada sentencia (ver el docstring del módulo)."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.info['wrote'] = True
+            elif not self.info.get('wrote') and replica_router.read_only_request():
+                key = self.info.get('replica')
+                if key is None:
+                    key = self.info['replica'] = replica_router.next_replica()
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
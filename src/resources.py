@@ -0,0 +1,192 @@
+"""
+Registro declarativo de recursos: a partir de un modelo de models.py genera las rutas
+
+    GET    /<path>                          listado (filtros, ?fields=, paginación, streaming)
+    GET    /<path>/<id>                     detalle
+    GET    /<path>/popular                  los más favoritos (?limit=, por defecto 10)
+    POST   /likes/<path>/<user_id>/<id>     agregar favorito
+    DELETE /likes/<path>/<user_id>/<id>     borrar favorito
+
+Cache, ETags, paginación, filtros y eager loading se implementan una sola vez acá,
+así cualquier modelo nuevo que se registre los tiene todos.
+"""
+from flask import jsonify, request
+from sqlalchemy.orm import selectinload
+from cache import cached, conditional
+from favorites import register_like_type, add_like, remove_like, popular
+from filters import apply_filters, int_arg
+from models import db, User, LikeCount
+from pagination import paginate, MAX_PAGE_SIZE
+from serializers import public_fields, compile_serializer, row_serializer
+from streaming import wants_stream, stream_rows
+from utils import APIException
+
+ALL_ROUTES = ('list', 'detail', 'likes')
+# Parámetros que lee el listado además de los filtros; el resto no entra en la clave del cache
+LIST_PARAMS = ('fields', 'limit', 'after')
+POPULAR_PARAMS = ('limit',)
+POPULAR_SIZE = 10
+
+
+class Resource:
+    def __init__(self, model, path, label, routes=ALL_ROUTES, filters=(), eager=(),
+                 like_column=None, relationship=None):
+        self.model = model
+        self.path = path
+        self.label = label  # "planeta", "personaje"... para los mensajes
+        self.routes = routes
+        self.filters = list(filters)
+        self.eager = eager
+        self.like_column = like_column
+        self.relationship = relationship
+        self.table = model.__tablename__
+        # Los campos públicos son los que devuelve serialize() (así User nunca expone password)
+        self.fields = public_fields(model)
+        self.column_fields = tuple(name for name in self.fields if name in model.__table__.columns)
+        self.serialize = compile_serializer(model)
+        self.list_params = tuple(name for name, column, op in self.filters) + LIST_PARAMS
+
+    def parse_fields(self, args=None):
+        """Lee ?fields=id,name. Devuelve None si no se pidió un subconjunto de campos."""
+        raw = (request.args if args is None else args).get('fields')
+        if not raw:
+            return None
+        fields = [name.strip() for name in raw.split(',') if name.strip()]
+        unknown = [name for name in fields if name not in self.column_fields]
+        if unknown or not fields:
+            raise APIException("fields no soportados: %s" % ", ".join(unknown), status_code=400)
+        return tuple(fields)
+
+    def list_fields(self, args=None):
+        """Campos a leer como filas Core, o None si hay que pasar por las entidades ORM."""
+        fields = self.parse_fields(args)
+        if fields is None and self.column_fields == self.fields:
+            # serialize() solo devuelve columnas: se leen como filas Core, sin construir entidades ORM
+            fields = self.fields
+        return fields
+
+    def projected_columns(self, fields):
+        # El id se agrega siempre al final porque lo necesita la paginación por cursor.
+        columns = [getattr(self.model, name) for name in fields]
+        if 'id' not in fields:
+            columns.append(self.model.id)
+        return columns
+
+    def projected_query(self, fields):
+        # SELECT solo de las columnas pedidas: devuelve tuplas livianas, sin entidades ORM ni identity map.
+        return self.model.query.with_entities(*self.projected_columns(fields))
+
+    def base_query(self):
+        query = self.model.query
+        for name in self.eager:
+            query = query.options(selectinload(getattr(self.model, name)))
+        return query
+
+    # ---- vistas ---------------------------------------------------------------------
+
+    def list_view(self):
+        fields = self.list_fields()
+        if fields is None:
+            query, serialize = self.base_query(), self.serialize
+        else:
+            query, serialize = self.projected_query(fields), row_serializer(fields)
+        query = apply_filters(query, self.filters)
+        if wants_stream():
+            return stream_rows(self.model, query, serialize)
+        page = paginate(self.model, query, serialize)
+        if page is not None:
+            return jsonify(page), 200
+        results = [serialize(item) for item in query.all()]
+        return jsonify(results), 200
+
+    def detail_view(self, item_id):
+        item = self.base_query().filter(self.model.id == item_id).first()
+        if item is None:
+            return jsonify(self.not_found_message()), 404
+        return jsonify(self.serialize(item)), 200
+
+    def popular_view(self):
+        # Top-N sobre el índice de like_count: no cuenta favoritos en cada request
+        limit = int_arg('limit')
+        if limit is None:
+            limit = POPULAR_SIZE
+        if limit < 1:
+            raise APIException("limit debe ser mayor a 0", status_code=400)
+        results = []
+        for item, count in popular(self.base_query(), self.like_column, min(limit, MAX_PAGE_SIZE)):
+            entry = self.serialize(item)
+            entry['likes'] = count
+            results.append(entry)
+        return jsonify(results), 200
+
+    def add_like_view(self, user_id, item_id):
+        body, status = self.add_like_message(add_like(user_id, self.like_column, item_id))
+        return jsonify(body), status
+
+    def remove_like_view(self, user_id, item_id):
+        if remove_like(user_id, self.like_column, item_id):
+            body, status = self.remove_like_message(True)
+        else:
+            # Solo cuando no se borró nada se consulta si el usuario existe, para el mensaje
+            body, status = self.remove_like_message(False, db.session.get(User, user_id) is not None)
+        return jsonify(body), status
+
+    # ---- mensajes (compartidos con asgi.py) --------------------------------------------
+
+    def not_found_message(self):
+        return {"msg": "%s no existente" % self.label}
+
+    def add_like_message(self, resultado):
+        if resultado == self.like_column:
+            return {"msg": "El %s no existe" % self.label}, 404
+        if resultado == 'user_id':
+            return {"msg": "El usuario no existe"}, 404
+        if resultado == 'exists':
+            return {"msg": "El %s ya está agregado" % self.label}, 404
+        return {"msg": "Se ha agregado el %s a favoritos" % self.label}, 200
+
+    def remove_like_message(self, removed, user_exists=True):
+        if removed:
+            return {"msg": "El %s seleccionado fue borrado con exito" % self.label}, 200
+        if not user_exists:
+            return {"msg": "El usuario ingresado no existe"}, 404
+        return {"msg": "El %s ingresado no existe dentro de favoritos" % self.label}, 404
+
+    # ---- rutas ----------------------------------------------------------------------
+
+    def register(self, app):
+        if 'list' in self.routes:
+            view = conditional(self.table, params=self.list_params)(
+                cached(self.table, params=self.list_params)(self.list_view))
+            app.add_url_rule('/%s' % self.path, self.path + '_list', view, methods=['GET'])
+        if 'detail' in self.routes:
+            view = conditional(self.table)(cached(self.table)(self.detail_view))
+            app.add_url_rule('/%s/<int:item_id>' % self.path, self.path + '_detail', view, methods=['GET'])
+        if 'likes' in self.routes:
+            view = conditional(LikeCount.__tablename__, self.table, params=POPULAR_PARAMS)(
+                cached(LikeCount.__tablename__, self.table, params=POPULAR_PARAMS)(self.popular_view))
+            app.add_url_rule('/%s/popular' % self.path, self.path + '_popular', view, methods=['GET'])
+            rule = '/likes/%s/<int:user_id>/<int:item_id>' % self.path
+            app.add_url_rule(rule, self.path + '_like_add', self.add_like_view, methods=['POST'])
+            app.add_url_rule(rule, self.path + '_like_remove', self.remove_like_view, methods=['DELETE'])
+            register_like_type(self.path, self.like_column, self.model, self.relationship)
+
+
+class ResourceRegistry:
+    def __init__(self):
+        self.resources = {}
+
+    def register(self, model, path, label, **options):
+        resource = Resource(model, path, label, **options)
+        self.resources[path] = resource
+        return resource
+
+    def like_tables(self):
+        return [resource.table for resource in self.resources.values() if 'likes' in resource.routes]
+
+    def init_app(self, app):
+        for resource in self.resources.values():
+            resource.register(app)
+
+
+resources = ResourceRegistry()
@@ -0,0 +1,70 @@
+"""
+Serialización rápida de respuestas: proveedor JSON de Flask basado en orjson (si está
+instalado) y serializadores generados una sola vez por modelo a partir de sus columnas.
+"""
+import os
+from functools import lru_cache
+from operator import attrgetter
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Mismo comportamiento que el proveedor por defecto (claves ordenadas), pero codificando con orjson.
+    Lo que orjson no sabe codificar pasa por el default de Flask."""
+
+    def dumps(self, obj, **kwargs):
+        return self._encode(obj).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._encode(obj) + b"\n", mimetype=self.mimetype)
+
+    def _encode(self, obj):
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+
+def init_json(app):
+    """JSON_PROVIDER=auto (orjson si está disponible), orjson o std."""
+    kind = app.config.setdefault('JSON_PROVIDER', os.getenv('JSON_PROVIDER', 'auto'))
+    if kind == 'orjson' and orjson is None:
+        raise RuntimeError("JSON_PROVIDER=orjson requiere el paquete 'orjson'")
+    if kind in ('auto', 'orjson') and orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def public_fields(model):
+    """Campos públicos de un modelo: las claves que devuelve su serialize()."""
+    return tuple(model().serialize().keys())
+
+
+def compile_serializer(model):
+    """Genera, una sola vez por clase, un serializador equivalente a model.serialize().
+
+    Si todos los campos públicos son columnas se leen de una vez con attrgetter;
+    si serialize() calcula algo más, se usa el método del modelo tal cual.
+    """
+    fields = public_fields(model)
+    columns = model.__table__.columns
+    if not all(name in columns for name in fields):
+        return model.serialize
+    getter = attrgetter(*fields)
+    if len(fields) == 1:
+        return lambda item: {fields[0]: getter(item)}
+    return lambda item: dict(zip(fields, getter(item)))
+
+
+@lru_cache(maxsize=256)
+def row_serializer(fields):
+    """Serializador de filas Core (tuplas del SELECT de `fields`)."""
+    return lambda row: dict(zip(fields, row))
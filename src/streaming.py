@@ -0,0 +1,44 @@
+from flask import Response, json, request, stream_with_context
+from pagination import page_args
+
+NDJSON_MIMETYPE = 'application/x-ndjson'
+STREAM_BATCH_SIZE = 1000
+
+def wants_stream(args=None, accept=None):
+    """True si el cliente pidió NDJSON, por ?stream=1 o por el header Accept.
+    `args` y `accept` (MIMEAccept) son por defecto los del request de Flask."""
+    if args is None:
+        args = request.args
+    if accept is None:
+        accept = request.accept_mimetypes
+    if args.get('stream') in ('1', 'true'):
+        return True
+    best = accept.best_match(['application/json', NDJSON_MIMETYPE])
+    return best == NDJSON_MIMETYPE
+
+def stream_query(query, model, args=None):
+    """Orden por id y los ?limit=/?after= del listado, que en NDJSON valen igual que en una
+    página (mismo máximo y mismo cursor) pero sin el sobre {"results", "next"}.
+    Sirve tanto para Query como para select(); `args` por defecto es request.args."""
+    limit, after = page_args(args)
+    if after is not None:
+        query = query.filter(model.id > after)
+    query = query.order_by(model.id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query
+
+def stream_rows(model, query=None, serialize=None):
+    # yield_per trae las filas de a lotes (cursor del lado del servidor en PostgreSQL),
+    # así la memoria no crece con el tamaño de la tabla y el primer byte sale enseguida
+    if query is None:
+        query = model.query
+    if serialize is None:
+        serialize = model.serialize
+    query = stream_query(query, model).yield_per(STREAM_BATCH_SIZE)
+
+    def generate():
+        for item in query:
+            yield json.dumps(serialize(item)) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype=NDJSON_MIMETYPE)
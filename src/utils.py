@@ -1,4 +1,5 @@
-from flask import jsonify, url_for
+import hashlib
+from flask import current_app, jsonify, request, url_for
 
 class APIException(Exception):
     status_code = 400
@@ -21,7 +22,8 @@ def has_no_empty_params(rule):
     return len(defaults) >= len(arguments)
 
 def generate_sitemap(app):
-    links = ['/admin/']
+    # Flask-Admin solo está si create_app() lo cargó (ENABLE_ADMIN)
+    links = ['/admin/'] if 'admin' in app.blueprints else []
     for rule in app.url_map.iter_rules():
         # Filter out rules we can't navigate to in a browser
         # and rules that require parameters
@@ -39,3 +41,24 @@ def generate_sitemap(app):
         <p>Start working on your proyect by following the <a href="https://start.4geeksacademy.com/starters/flask" target="_blank">Quick Start</a></p>
         <p>Remember to specify a real endpoint path like: </p>
         <ul style="text-align: left;">"""+links_html+"</ul></div>"
+
+
+def static_document(name, build, mimetype):
+    """Respuesta para un documento que no cambia mientras vive el proceso (sitemap, spec).
+    Se arma con build() la primera vez que se pide y después sale de memoria, con ETag
+    y 304 si el cliente ya lo tiene."""
+    documents = current_app.extensions.setdefault('static_documents', {})
+    document = documents.get(name)
+    if document is None:
+        # Dos threads pueden armarlo a la vez al principio: el resultado es el mismo
+        body = build()
+        if isinstance(body, str):
+            body = body.encode()
+        document = documents[name] = (body, hashlib.sha1(body).hexdigest())
+    body, etag = document
+    if request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    return response